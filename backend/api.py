@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import os
 import sys
@@ -12,42 +12,124 @@ try:
     from schedule_generator import generate_schedule
     import gcal_integration
     import converse_api
+    from course_index import CourseNotFoundError
+    from schedule_solver import NoValidScheduleError
+    import jobs
+    import singleflight
+    import calendar_entries
+    import ics_export
+    import metrics
 except Exception as e:
     print(f"Warning: Could not import all modules: {e}")
 
 app = Flask(__name__)
 CORS(app)
 
+@app.before_request
+def start_request_timing():
+    # Pipeline stages run during the request add their time to this trace
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.timing = metrics.Trace(f"{request.method} {rule}")
+    g.timing.activate()
+
+@app.after_request
+def finish_request_timing(response):
+    timing = g.get('timing')
+    if timing is None:
+        return response
+    if response.is_streamed:
+        # Still running: finish once the body is sent. Generators that set
+        # their own status (the SSE stream) finish the trace first.
+        response.call_on_close(lambda: timing.finish(response.status_code))
+    else:
+        timing.finish(response.status_code)
+    return response
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy'}), 200
+    status = {'status': 'healthy'}
+    try:
+        status['catalog_cache'] = converse_api.catalog.catalog_stats()
+        status['rmp_latency'] = converse_api.ratemyprof_info.latency_stats()
+        status['jobs'] = job_queue.stats()
+        status['coalescing'] = schedule_flights.stats
+        status['llm_cache'] = converse_api.llm_cache.get_cache().stats
+        status['prompt_cache'] = converse_api.prompt_cache_stats
+    except Exception:
+        pass
+    return jsonify(status), 200
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Stage, Bedrock, RMP and Google Calendar timings in Prometheus text format."""
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+def schedule_request_args(data):
+    """Log a schedule request and turn its JSON body into generate_schedules arguments."""
+    quarter = data.get('quarter', 'Fall')
+    days_of_week = data.get('days_of_week', [])
+    time_preference = data.get('time_preference', 'any')
+    courses = data.get('courses', [])
+    teacher_preference = data.get('teacher_preference', '')
+    num_schedules = data.get('num_schedules', 3)
+    
+    print(f"📝 Received schedule generation request:")
+    print(f"  Quarter: {quarter}")
+    print(f"  Days: {days_of_week}")
+    print(f"  Time: {time_preference}")
+    print(f"  Courses: {courses}")
+    print(f"  Teacher preference: {teacher_preference}")
+    
+    # Convert courses list to comma-separated string
+    courses_str = ','.join(courses) if isinstance(courses, list) else courses
+    
+    return {
+        'specific_courses': courses_str,
+        'teacher_preference': teacher_preference or 'Good teacher',
+        'num_schedules': int(num_schedules),
+        'llm_fallback': bool(data.get('llm_fallback', converse_api.LLM_SECTION_FALLBACK)),
+        # Ask for new options instead of cached or shared ones
+        'fresh': bool(data.get('fresh', False))
+    }
+
+def schedule_key(data, args):
+    """
+    singleflight key for a request body and its generate_schedules
+    arguments; None (no coalescing) for requests that want fresh options.
+    """
+    if args.get('fresh'):
+        return None
+    return singleflight.request_key(quarter=data.get('quarter', 'Fall'), **args)
+
+def coalesced_schedule_events(key, **args):
+    """
+    converse_api.iter_schedule_events, shared between identical concurrent
+    requests and briefly cached (see singleflight).
+    """
+    return schedule_flights.stream(
+        key,
+        lambda: converse_api.iter_schedule_events(**args),
+        converse_api.collect_schedules,
+        converse_api.schedule_events_from_result,
+        # Lets a job waiting on an identical request still time out or be cancelled
+        wait_event={'event': 'stage', 'stage': 'waiting',
+                    'message': 'Waiting for an identical request in progress'}
+    )
+
+schedule_flights = singleflight.SingleFlight()
+job_queue = jobs.JobQueue(coalesced_schedule_events)
 
 @app.route('/api/generate-schedule', methods=['POST'])
 def generate_schedule_endpoint():
     try:
         data = request.json
-        quarter = data.get('quarter', 'Fall')
-        days_of_week = data.get('days_of_week', [])
-        time_preference = data.get('time_preference', 'any')
-        courses = data.get('courses', [])
-        teacher_preference = data.get('teacher_preference', '')
-        num_schedules = data.get('num_schedules', 3)
-        
-        print(f"📝 Received schedule generation request:")
-        print(f"  Quarter: {quarter}")
-        print(f"  Days: {days_of_week}")
-        print(f"  Time: {time_preference}")
-        print(f"  Courses: {courses}")
-        print(f"  Teacher preference: {teacher_preference}")
-        
-        # Convert courses list to comma-separated string
-        courses_str = ','.join(courses) if isinstance(courses, list) else courses
+        args = schedule_request_args(data)
         
-        # Generate schedule using converse_api (real Claude AI integration)
-        schedules = converse_api.generate_schedules(
-            specific_courses=courses_str,
-            teacher_preference=teacher_preference or 'Good teacher',
-            num_schedules=int(num_schedules)
+        # Generate schedule using converse_api (real Claude AI integration);
+        # identical requests in flight or finished moments ago share one result
+        schedules = schedule_flights.do(
+            schedule_key(data, args),
+            lambda: converse_api.generate_schedules(**args)
         )
         
         # Format results for frontend
@@ -64,12 +146,117 @@ def generate_schedule_endpoint():
         
         return jsonify({'success': True, 'data': result}), 200
         
+    except CourseNotFoundError as e:
+        print(f"⚠️ {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except NoValidScheduleError as e:
+        print(f"⚠️ {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 422
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/generate-schedule/stream', methods=['POST'])
+def generate_schedule_stream_endpoint():
+    """
+    Server-Sent Events version of /api/generate-schedule.
+    
+    Takes the same JSON body and streams "stage", "schedule", "analysis"
+    and "done" events (see converse_api.iter_schedule_events) as they
+    happen, or an "error" event with the status code the blocking endpoint
+    would have returned. POST, so read it with fetch() rather than EventSource.
+    """
+    try:
+        data = request.json
+        args = schedule_request_args(data)
+        key = schedule_key(data, args)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    timing = g.get('timing')
+    
+    def events():
+        status = 200
+        if timing is not None:
+            timing.activate()
+        try:
+            for event in coalesced_schedule_events(key, **args):
+                payload = dict(event)
+                yield sse_event(payload.pop('event'), payload)
+        except GeneratorExit:
+            status = 499  # client went away
+            raise
+        except CourseNotFoundError as e:
+            print(f"⚠️ {str(e)}")
+            status = 404
+            yield sse_event('error', {'error': str(e), 'status': status})
+        except NoValidScheduleError as e:
+            print(f"⚠️ {str(e)}")
+            status = 422
+            yield sse_event('error', {'error': str(e), 'status': status})
+        except Exception as e:
+            print(f"❌ Error: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            status = 500
+            yield sse_event('error', {'error': str(e), 'status': status})
+        finally:
+            if timing is not None:
+                timing.finish(status)
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        # Disable proxy buffering so each event reaches the browser immediately
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """
+    Queue a schedule generation job (same body as /api/generate-schedule).
+    
+    Returns 202 with a job id to poll at /api/jobs/<job_id>, or 503 if the
+    queue is full.
+    """
+    try:
+        data = request.json
+        args = schedule_request_args(data)
+        job = job_queue.submit(dict(args, key=schedule_key(data, args)))
+    except jobs.QueueFullError as e:
+        print(f"⚠️ {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '5'}
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    print(f"🧾 Queued job {job.id}")
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status and the schedules produced so far."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    
+    data = job.to_dict()
+    if job.status == jobs.FAILED or job.status == jobs.TIMED_OUT:
+        return jsonify({'success': False, 'error': job.error, 'data': data}), job.status_code
+    return jsonify({'success': True, 'data': data}), 200
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    print(f"🛑 Cancel requested for job {job.id}")
+    return jsonify({'success': True, 'data': job.to_dict()}), 200
+
 @app.route('/api/quarters', methods=['GET'])
 def get_quarters():
     return jsonify([
@@ -84,49 +271,54 @@ def add_to_calendar():
         data = request.json
         schedule_data = data.get('schedule', [])
         calendar_name = data.get('calendar_name', 'Class Schedule')
+        # Sync (default): update the events added for this term before
+        # instead of inserting them again
+        sync = bool(data.get('sync', True))
         
         print(f"📅 Adding schedule to Google Calendar...")
         print(f"  Calendar name: {calendar_name}")
         print(f"  Number of events: {len(schedule_data)}")
         
-        # Save schedule to CSV temporarily
-        import csv
-        # Get the absolute path to backend directory
-        backend_dir = os.path.dirname(os.path.abspath(__file__))
-        csv_filename = os.path.join(backend_dir, 'schedule.csv')
-        
-        print(f"  Writing CSV to: {csv_filename}")
-        
-        with open(csv_filename, 'w', newline='') as csvfile:
-            fieldnames = ['summary', 'location', 'description', 'start', 'end', 'days_of_week', 'end_sem']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for entry in schedule_data:
-                # Ensure days_of_week is a string
-                entry_copy = entry.copy()
-                if isinstance(entry.get('days_of_week'), list):
-                    entry_copy['days_of_week'] = ','.join(entry['days_of_week'])
-                writer.writerow(entry_copy)
+        # Parse entries once, in memory (no shared schedule.csv)
+        try:
+            entries = calendar_entries.parse_entries(schedule_data)
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({'success': False, 'error': f'Invalid schedule entry: {e}'}), 400
         
-        print(f"  ✅ CSV file created successfully")
+        # The sync scope comes from the entries' own dates, never from the
+        # optional "quarter" label, so every request for the same schedule
+        # (synced or added) gets the same event keys
+        term = calendar_entries.term_of(entries)
         
         # Add to Google Calendar using gcal.py
-        from gcal import get_or_create_calendar, add_events_from_csv
+        # (service, credentials and calendar id are cached between requests)
+        import gcal
+        service = gcal.get_service()
         print(f"  📝 Getting or creating calendar...")
-        calendar_id = get_or_create_calendar(calendar_name)
+        calendar_id = gcal.get_or_create_calendar(calendar_name, service=service)
         print(f"  📅 Calendar ID: {calendar_id}")
-        print(f"  ➕ Adding events from CSV...")
-        add_events_from_csv(calendar_id, csv_filename)
+        print(f"  ➕ Adding events...")
         
-        print(f"  🧹 Cleaning up CSV file...")
-        # Clean up CSV file
-        if os.path.exists(csv_filename):
-            os.remove(csv_filename)
-            print(f"  ✅ CSV file deleted")
+        def add_events(calendar_id):
+            if sync:
+                return gcal.sync_entries(calendar_id, entries, term, service=service)
+            gcal.add_entries(calendar_id, entries, service=service, term=term)
+            return None
+        
+        try:
+            changes = add_events(calendar_id)
+        except Exception as e:
+            if not gcal.is_missing_calendar(e):
+                raise
+            # The remembered calendar was deleted; look it up again
+            print(f"  ⚠️ Calendar {calendar_id} no longer exists, recreating it")
+            calendar_id = gcal.get_or_create_calendar(calendar_name, service=service, refresh=True)
+            changes = add_events(calendar_id)
         
         return jsonify({
             'success': True, 
             'calendar_id': calendar_id,
+            'changes': changes,
             'message': 'Schedule added to Google Calendar successfully!'
         }), 200
         
@@ -136,6 +328,29 @@ def add_to_calendar():
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/export-ics', methods=['POST'])
+def export_ics():
+    """
+    Download a schedule option as an .ics file (no Google account needed).
+    
+    Takes {"schedule": [...entries...], "calendar_name": "..."}, the same
+    body as /api/add-to-calendar.
+    """
+    data = request.json or {}
+    calendar_name = data.get('calendar_name', 'Class Schedule')
+    try:
+        entries = calendar_entries.parse_entries(data.get('schedule', []))
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({'success': False, 'error': f'Invalid schedule entry: {e}'}), 400
+    
+    print(f"📤 Exporting {len(entries)} events as iCalendar")
+    filename = ''.join(c if c.isalnum() or c in '-_' else '_' for c in calendar_name) or 'schedule'
+    return Response(
+        ics_export.iter_ics(entries, calendar_name),
+        mimetype='text/calendar',
+        headers={'Content-Disposition': f'attachment; filename="{filename}.ics"'}
+    )
+
 if __name__ == '__main__':
     print("🚀 Flask Server Starting...")
     app.run(debug=True, port=5001, host='0.0.0.0')
\ No newline at end of file
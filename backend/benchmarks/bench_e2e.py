@@ -0,0 +1,312 @@
+"""
+End-to-end benchmark of generate_schedules and /api/add-to-calendar, offline.
+
+S3, Bedrock, RateMyProfessors and Google Calendar are replaced by local
+stand-ins (fake_s3, fake_bedrock, fake_rmp, fake_gcal) with configurable
+latencies, so this runs on a laptop without network or credentials. For
+each concurrency level it reports requests/second and p50/p90/p99 of the
+end-to-end time and of every pipeline stage recorded by metrics.py.
+
+    python benchmarks/bench_e2e.py
+    python benchmarks/bench_e2e.py --levels 1,8,32 --requests 64 --ttft 0.8 --tokens-per-sec 60
+    python benchmarks/bench_e2e.py --rmp-cache cold --recordings llm_cache
+
+Everything the run writes (catalog, caches) goes to a temporary directory.
+"""
+import argparse
+import io
+import itertools
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_bedrock import FakeBedrockClient
+from fake_gcal import FakeCalendarService, FakeCalendarStore
+from fake_rmp import RMPStub
+from fake_s3 import FakeS3Client
+
+SUBJECTS = ["MATH", "CSCI", "PHYS", "CHEM", "ENGL", "COEN", "ECON", "HIST"]
+PATTERNS = ["M W F | 8:00 AM - 9:05 AM", "M W F | 9:15 AM - 10:20 AM", "M W F | 11:45 AM - 12:50 PM",
+            "M W F | 2:15 PM - 3:20 PM", "T R | 8:30 AM - 10:10 AM", "T R | 10:20 AM - 12:00 PM",
+            "T R | 2:00 PM - 3:40 PM", "M W | 5:10 PM - 7:15 PM", "R | 7:00 PM - 9:00 PM"]
+FIRST_NAMES = ["Jane", "John", "Maria", "Wei", "Priya", "Carlos", "Aiko", "Samuel", "Fatima", "Olga"]
+LAST_NAMES = ["Doe", "Roe", "Garcia", "Chen", "Patel", "Nguyen", "Smith", "Kowalski", "Haddad", "Ivanova"]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--levels", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per level (at least the level)")
+    parser.add_argument("--courses", default=None, help="Courses to ask for (default: first four in the catalog)")
+    parser.add_argument("--num-schedules", type=int, default=3)
+    parser.add_argument("--catalog-courses", type=int, default=120, help="Courses in the generated catalog")
+    parser.add_argument("--sections", type=int, default=4, help="Sections per generated course")
+    parser.add_argument("--s3-latency", type=float, default=0.05, help="Seconds per S3 call")
+    parser.add_argument("--s3-bandwidth", type=float, default=50e6, help="S3 download bytes/second")
+    parser.add_argument("--revalidate", type=float, default=0.0,
+                        help="CATALOG_REVALIDATE_SECONDS (0: a conditional GET on every request)")
+    parser.add_argument("--ttft", type=float, default=0.4, help="Bedrock seconds to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0, help="Bedrock output speed")
+    parser.add_argument("--recordings", default=None,
+                        help="llm_cache directory whose recorded analysis answers are replayed")
+    parser.add_argument("--rmp-latency", type=float, default=0.08, help="Seconds per RMP GraphQL request")
+    parser.add_argument("--rmp-cache", choices=["warm", "cold"], default="warm",
+                        help="cold expires every RMP cache entry immediately, so each request hits the stub")
+    parser.add_argument("--gcal-latency", type=float, default=0.1, help="Seconds per Calendar API round trip")
+    parser.add_argument("--gcal-rate-limit", type=float, default=0.0,
+                        help="Share of batched Calendar requests answered with 429")
+    parser.add_argument("--calendar-mode", choices=["new", "resync"], default="new",
+                        help="new: every request creates a calendar; resync: one calendar per worker")
+    parser.add_argument("--skip", choices=["generate", "calendar"], action="append", default=[])
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's own log output")
+    return parser.parse_args()
+
+def configure_environment(args, workdir, rmp_url):
+    """Point every cache at workdir and the RMP client at the stub (before the imports)."""
+    os.environ["RMP_GRAPHQL_URL"] = rmp_url
+    os.environ["RMP_CACHE_PATH"] = os.path.join(workdir, "rmp_cache.sqlite3")
+    if args.rmp_cache == "cold":
+        for name in ("RMP_RATINGS_TTL", "RMP_COMMENTS_TTL", "RMP_NOT_FOUND_TTL", "RMP_STALE_TTL"):
+            os.environ[name] = "0"
+    os.environ["CATALOG_COMPILED_PATH"] = os.path.join(workdir, "catalog.arrow")
+    os.environ["CATALOG_REVALIDATE_SECONDS"] = str(args.revalidate)
+    os.environ["LLM_CACHE_DIR"] = os.path.join(workdir, "llm_cache")
+    # The fake client is what's being measured; replaying answers would skip it
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+
+def build_catalog(num_courses, sections_per_course, seed=7):
+    """Catalog rows shaped like SCU_Find_Course_Sections.xlsx."""
+    rng = random.Random(seed)
+    rows = []
+    for c in range(num_courses):
+        subject = SUBJECTS[c % len(SUBJECTS)]
+        number = 10 + c // len(SUBJECTS)
+        for s in range(1, sections_per_course + 1):
+            capacity = rng.choice([30, 40, 60])
+            enrolled = rng.randrange(0, capacity + 1)
+            rows.append({
+                "Course Section": f"{subject} {number}-{s} - {subject.title()} Topics {number}",
+                "All Instructors": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "Section Status": "Open" if enrolled < capacity else "Closed",
+                "Enrolled/Capacity": f"{enrolled}/{capacity}",
+                "Meeting Patterns": rng.choice(PATTERNS),
+                "Locations": f"{rng.choice(['Daly Science', 'Kenna Hall', 'SCDI', 'Lucas Hall'])} {rng.randrange(100, 400)}",
+                "Start Date": "2025-09-22",
+                "End Date": "2025-12-12",
+            })
+    return rows
+
+def upload_catalog(s3, rows):
+    import pandas as pd
+    import catalog
+    buffer = io.BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, index=False)
+    s3.put_object(Bucket=catalog.BUCKET_NAME, Key=catalog.S3_KEY, Body=buffer.getvalue())
+    return len(buffer.getvalue())
+
+def load_recordings(path):
+    """Text of recorded analysis answers (JSON arrays) in an llm_cache directory."""
+    texts = []
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(root, name), encoding='utf-8') as f:
+                events = json.load(f).get('events', [])
+            text = ''.join(e['contentBlockDelta']['delta'].get('text', '')
+                           for e in events if 'contentBlockDelta' in e)
+            if '"pros"' in text:
+                texts.append(text)
+    return texts
+
+def analysis_responder(recordings=None):
+    """FakeBedrockClient respond callable: replay recordings, else answer every "Option N:"."""
+    counter = itertools.count()
+
+    def respond(request):
+        if recordings:
+            return recordings[next(counter) % len(recordings)]
+        prompt = ''.join(block.get('text', '') for message in request['messages']
+                         for block in message['content'])
+        options = re.findall(r"^Option (\d+):", prompt, re.MULTILINE)
+        return json.dumps([
+            {"option": int(n), "pros": ["Highly rated professors", "Compact weekly schedule"],
+             "cons": ["One early morning class"]}
+            for n in options
+        ], indent=2)
+    return respond
+
+def percentile(values, p):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+class StageRecorder:
+    """Keeps the stage breakdown of the last trace each thread finished."""
+
+    def __init__(self, metrics):
+        self._local = threading.local()
+        finish = metrics.Trace.finish
+        recorder = self
+
+        def recording_finish(trace, status=200, **fields):
+            recorder._local.stages = dict(trace.stages)
+            finish(trace, status, **fields)
+
+        metrics.Trace.finish = recording_finish
+
+    def take(self):
+        stages = getattr(self._local, 'stages', {})
+        self._local.stages = {}
+        return stages
+
+def run_level(call, concurrency, total):
+    """
+    Run call(i) total times on concurrency threads.
+
+    Returns:
+        (results, wall seconds); results are (seconds, stages, error) tuples
+    """
+    def timed(i):
+        start = time.perf_counter()
+        try:
+            stages, error = call(i), None
+        except Exception as e:
+            stages, error = {}, f"{type(e).__name__}: {e}"
+        return time.perf_counter() - start, stages, error
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, range(total)))
+    return results, time.perf_counter() - start
+
+def report(name, concurrency, results, wall, out):
+    errors = [error for _, _, error in results if error]
+    ok = [r for r in results if not r[2]]
+    print(f"\n{name} @ concurrency {concurrency}: {len(results)} requests in {wall:.2f}s "
+          f"= {len(ok) / wall:.1f} req/s, {len(errors)} errors", file=out)
+    if errors:
+        print(f"  first error: {errors[0]}", file=out)
+    if not ok:
+        return
+    rows = [("end_to_end", [seconds for seconds, _, _ in ok])]
+    stage_names = []
+    for _, stages, _ in ok:
+        stage_names.extend(s for s in stages if s not in stage_names)
+    for stage in stage_names:
+        rows.append((stage, [stages[stage] for _, stages, _ in ok if stage in stages]))
+    print(f"  {'stage (ms)':<24}{'n':>5}{'p50':>10}{'p90':>10}{'p99':>10}", file=out)
+    for stage, values in rows:
+        print(f"  {stage:<24}{len(values):>5}" + "".join(
+            f"{percentile(values, p) * 1000:>10.1f}" for p in (50, 90, 99)), file=out)
+
+def main():
+    args = parse_args()
+    out = sys.stdout
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+    workdir = tempfile.mkdtemp(prefix="schedule-bench-")
+    rmp = RMPStub(latency=args.rmp_latency).start()
+    configure_environment(args, workdir, rmp.url)
+
+    import catalog
+    import converse_api
+    import gcal
+    import metrics
+    import api
+
+    s3 = FakeS3Client(os.path.join(workdir, "s3"), latency=args.s3_latency, bytes_per_sec=args.s3_bandwidth)
+    rows = build_catalog(args.catalog_courses, args.sections)
+    size = upload_catalog(s3, rows)
+    catalog._catalog_cache = catalog.CatalogCache(
+        client_factory=lambda: s3, compiled_path=os.path.join(workdir, "catalog.arrow"))
+
+    recordings = load_recordings(args.recordings) if args.recordings else None
+    bedrock = FakeBedrockClient(analysis_responder(recordings), ttft=args.ttft,
+                                tokens_per_sec=args.tokens_per_sec)
+    converse_api.boto3 = types.SimpleNamespace(client=lambda *a, **kw: bedrock)
+
+    store = FakeCalendarStore()
+    gcal_local = threading.local()
+
+    def fake_service():
+        # One service per thread, like gcal.get_service
+        if getattr(gcal_local, 'service', None) is None:
+            gcal_local.service = FakeCalendarService(store, args.gcal_latency, args.gcal_rate_limit,
+                                                     seed=threading.get_ident())
+        return gcal_local.service
+    gcal.get_service = fake_service
+
+    recorder = StageRecorder(metrics)
+    course_names = dict.fromkeys(row["Course Section"].split("-")[0].strip() for row in rows)
+    courses = args.courses or ", ".join(list(course_names)[:4])
+    client = api.app.test_client()
+
+    print(f"Catalog: {len(rows)} sections ({size / 1e6:.1f} MB xlsx); courses: {courses}", file=out)
+    print(f"Stand-ins: S3 {args.s3_latency * 1000:.0f} ms, Bedrock TTFT {args.ttft * 1000:.0f} ms "
+          f"at {args.tokens_per_sec:g} tok/s{' (recorded answers)' if recordings else ''}, "
+          f"RMP {args.rmp_latency * 1000:.0f} ms ({args.rmp_cache} cache), "
+          f"Calendar {args.gcal_latency * 1000:.0f} ms", file=out)
+
+    def generate(i):
+        with metrics.trace('bench generate_schedules') as trace:
+            schedules = converse_api.generate_schedules(courses, "Clear lectures and fair grading",
+                                                        args.num_schedules)
+        if not schedules:
+            raise RuntimeError("no schedules generated")
+        return dict(trace.stages)
+
+    quiet = open(os.devnull, 'w')
+    try:
+        # Cold start (catalog download and parse, first RMP lookups), not counted below
+        with redirect_stdout(out if args.verbose else quiet):
+            start = time.perf_counter()
+            cold_stages = generate(-1)
+            cold = time.perf_counter() - start
+            sample = converse_api.generate_schedules(courses, "Clear lectures", args.num_schedules)[0]['schedule']
+        print(f"\nCold start: {cold * 1000:.0f} ms " + json.dumps(
+            {stage: round(seconds * 1000, 1) for stage, seconds in cold_stages.items()}), file=out)
+
+        # Unique across levels too: gcal remembers calendar ids by name
+        new_calendars = itertools.count()
+
+        def add_to_calendar(i):
+            if args.calendar_mode == "new":
+                name = f"Bench {next(new_calendars)}"
+            else:
+                name = f"Bench worker {threading.get_ident()}"
+            response = client.post('/api/add-to-calendar', json={
+                'schedule': sample, 'calendar_name': name, 'quarter': 'Fall'})
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}: {response.get_json()}")
+            return recorder.take()
+
+        benchmarks = [("generate", "generate_schedules", generate),
+                      ("calendar", "add-to-calendar", add_to_calendar)]
+        for key, name, call in benchmarks:
+            if key in args.skip:
+                continue
+            for level in levels:
+                with redirect_stdout(out if args.verbose else quiet):
+                    results, wall = run_level(call, level, max(level, args.requests))
+                report(name, level, results, wall, out)
+    finally:
+        quiet.close()
+        rmp.stop()
+
+    print(f"\nBackend calls: S3 {s3.calls}, Bedrock {len(bedrock.requests)}, RMP {rmp.requests}, "
+          f"Calendar {store.calls}", file=out)
+
+if __name__ == '__main__':
+    main()
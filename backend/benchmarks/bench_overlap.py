@@ -0,0 +1,101 @@
+"""
+Benchmark schedule overlap checks: pairwise datetime parsing vs weekly bitmasks.
+
+    python benchmarks/bench_overlap.py [num_schedules] [entries_per_schedule]
+"""
+import os
+import random
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import timeslots
+
+DAY_SETS = [["MO", "WE", "FR"], ["TU", "TH"], ["MO", "WE"], ["TH"], ["FR"]]
+
+def legacy_times_overlap(schedule1, schedule2):
+    """The original converse_api.times_overlap, kept here for comparison."""
+    days1 = set(schedule1.get('days_of_week', []))
+    days2 = set(schedule2.get('days_of_week', []))
+    if not days1 or not days2 or not days1.intersection(days2):
+        return False
+    try:
+        start1 = schedule1.get('start')
+        end1 = schedule1.get('end')
+        start2 = schedule2.get('start')
+        end2 = schedule2.get('end')
+        if not all([start1, end1, start2, end2]):
+            return False
+        dt_start1 = datetime.fromisoformat(start1)
+        dt_end1 = datetime.fromisoformat(end1)
+        dt_start2 = datetime.fromisoformat(start2)
+        dt_end2 = datetime.fromisoformat(end2)
+        return dt_start1 < dt_end2 and dt_start2 < dt_end1
+    except (ValueError, AttributeError):
+        return False
+
+def legacy_check_schedule_validity(schedule):
+    if not schedule or len(schedule) < 2:
+        return True
+    for i in range(len(schedule)):
+        for j in range(i + 1, len(schedule)):
+            if legacy_times_overlap(schedule[i], schedule[j]):
+                return False
+    return True
+
+def random_entry(rng):
+    start = rng.randrange(8 * 60, 20 * 60, 5)
+    end = start + rng.choice([65, 100, 180])
+    date = "2025-09-22"
+    return {
+        'summary': f"CRS {rng.randrange(1, 200)}-{rng.randrange(1, 9)}",
+        'start': f"{date}T{start // 60:02d}:{start % 60:02d}:00",
+        'end': f"{date}T{end // 60:02d}:{end % 60:02d}:00",
+        'days_of_week': rng.choice(DAY_SETS),
+    }
+
+def valid_schedule(rng, size):
+    """Rejection-sample a conflict-free schedule (the solver's usual output)."""
+    schedule = []
+    while len(schedule) < size:
+        entry = random_entry(rng)
+        if not any(legacy_times_overlap(entry, other) for other in schedule):
+            schedule.append(entry)
+    return schedule
+
+def run(label, schedules):
+    per_schedule = len(schedules[0])
+
+    legacy = [legacy_check_schedule_validity(s) for s in schedules]
+    current = [timeslots.schedule_is_valid(s) for s in schedules]
+    mismatches = sum(a != b for a, b in zip(legacy, current))
+
+    repeat = 5
+    legacy_time = min(timeit.repeat(
+        lambda: [legacy_check_schedule_validity(s) for s in schedules], number=1, repeat=repeat))
+
+    def cold():
+        timeslots._entry_mask.cache_clear()
+        return [timeslots.schedule_is_valid(s) for s in schedules]
+
+    cold_time = min(timeit.repeat(cold, number=1, repeat=repeat))
+    warm_time = min(timeit.repeat(
+        lambda: [timeslots.schedule_is_valid(s) for s in schedules], number=1, repeat=repeat))
+
+    print(f"{label}: {len(schedules)} schedules x {per_schedule} entries (best of {repeat})")
+    print(f"  pairwise datetime : {legacy_time * 1000:8.2f} ms")
+    print(f"  bitmask (cold)    : {cold_time * 1000:8.2f} ms  ({legacy_time / cold_time:.1f}x)")
+    print(f"  bitmask (cached)  : {warm_time * 1000:8.2f} ms  ({legacy_time / warm_time:.1f}x)")
+    print(f"  results differing : {mismatches}")
+
+def main():
+    num_schedules = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    per_schedule = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    rng = random.Random(42)
+    run("random", [[random_entry(rng) for _ in range(per_schedule)] for _ in range(num_schedules)])
+    run("conflict-free", [valid_schedule(rng, per_schedule) for _ in range(num_schedules)])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Check meeting_patterns.parse_meeting_pattern on the day spellings seen in
+catalogs, including the long ones ("Tues/Thurs", "Weds") whose trailing
+letters must not be read as extra days.
+
+    python benchmarks/check_meeting_patterns.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from meeting_patterns import MeetingPatternError, parse_days, parse_meeting_pattern
+
+DAYS = [
+    ("MWF", ('MO', 'WE', 'FR')),
+    ("M W F", ('MO', 'WE', 'FR')),
+    ("TTH", ('TU', 'TH')),
+    ("TR", ('TU', 'TH')),
+    ("TuTh", ('TU', 'TH')),
+    ("Tu/Th", ('TU', 'TH')),
+    ("Mon/Wed", ('MO', 'WE')),
+    ("Tue/Thu", ('TU', 'TH')),
+    ("Tues/Thurs", ('TU', 'TH')),
+    ("Tues Thur", ('TU', 'TH')),
+    ("Weds", ('WE',)),
+    ("Mon, Weds, Fri", ('MO', 'WE', 'FR')),
+    ("Thursday", ('TH',)),
+    ("Tuesday/Thursday", ('TU', 'TH')),
+    ("Sat", ('SA',)),
+    ("MTWRF", ('MO', 'TU', 'WE', 'TH', 'FR')),
+]
+
+PATTERNS = [
+    ("Tues/Thurs 10:00-11:40 am", ('TU', 'TH'), 600, 700),
+    ("Weds | 5:10 PM - 7:15 PM | Lucas Hall 207", ('WE',), 1030, 1155),
+    ("M W F | 1:00 PM - 2:05 PM", ('MO', 'WE', 'FR'), 780, 845),
+    ("1:00-2:05 pm Mon/Wed", ('MO', 'WE'), 780, 845),
+]
+
+REJECTED = ["Tues/Thurx", "Xyz"]
+
+def main():
+    for text, expected in DAYS:
+        assert parse_days(text) == expected, f"{text!r}: {parse_days(text)}"
+    for text, days, start, end in PATTERNS:
+        meeting = parse_meeting_pattern(text)
+        assert (meeting.days, meeting.start, meeting.end) == (days, start, end), f"{text!r}: {meeting}"
+    for text in REJECTED:
+        try:
+            parse_days(text)
+        except MeetingPatternError:
+            continue
+        raise AssertionError(f"{text!r} should be rejected")
+    print(f"✅ {len(DAYS) + len(PATTERNS) + len(REJECTED)} meeting pattern cases")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Check the analysis prompt's cache checkpoint against the local Bedrock stand-in.
+
+Two students with the same courses but different teacher preferences
+should share the cached prefix: the first call writes it, the second
+reads it. The fake answers every option, as Claude does, so this also
+checks that the usage metadata after the last option is still read.
+Asking again with the LLM response cache on must replay the answer
+without counting another prompt cache read or write.
+
+    python benchmarks/check_prompt_cache.py
+"""
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Replay must not hide the Bedrock calls
+os.environ["LLM_CACHE_ENABLED"] = "0"
+
+import converse_api
+import llm_cache
+import meeting_patterns
+from fake_bedrock import FakeBedrockClient
+
+ROWS = [
+    {"Course Section": "MATH 51-1 - Calculus III", "All Instructors": "Jane Doe",
+     "Meeting Patterns": "M W F | 1:00 PM - 2:05 PM", "Locations": "Daly Science 300",
+     "Section Status": "Open", "Enrolled/Capacity": "20/30"},
+    {"Course Section": "PHYS 32-2 - Physics II", "All Instructors": "John Roe",
+     "Meeting Patterns": "T R | 10:20 AM - 12:00 PM", "Locations": "SCDI 1308",
+     "Section Status": "Open", "Enrolled/Capacity": "12/40"},
+]
+
+def main():
+    class_numbers = {}
+    combo = tuple(meeting_patterns.parse_section_row(row, class_numbers) for row in ROWS)
+    answer = [{"option": 1, "pros": ["Good fit"], "cons": []},
+              {"option": 2, "pros": ["Same courses"], "cons": ["Same times"]}]
+    client = FakeBedrockClient(json.dumps(answer))
+
+    usages = []
+    for preference in ("Clear lectures", "Easy grader"):
+        before = dict(converse_api.prompt_cache_stats)
+        analysis = converse_api.analyze_schedules_with_llm(client, [combo, combo], {}, preference)
+        after = converse_api.prompt_cache_stats
+        usages.append({k: after[k] - before[k] for k in after})
+        assert analysis == answer, analysis
+
+    content = client.requests[-1]['messages'][0]['content']
+    assert any('cachePoint' in block for block in content), "no cache checkpoint in the prompt"
+    assert "Easy grader" in content[-1]['text'], "preference must come after the checkpoint"
+    assert usages[0]['cache_write_tokens'] > 0 and usages[0]['cache_read_tokens'] == 0, usages[0]
+    assert usages[1]['cache_read_tokens'] == usages[0]['cache_write_tokens'], usages[1]
+    assert usages[0]['calls'] == usages[1]['calls'] == 1, usages
+
+    # Record one answer, then replay it: only the recorded call counts
+    llm_cache.ENABLED = True
+    llm_cache._cache = llm_cache.LLMCache(tempfile.mkdtemp())
+    requests_before = len(client.requests)
+    before = dict(converse_api.prompt_cache_stats)
+    for _ in range(3):
+        assert converse_api.analyze_schedules_with_llm(client, [combo, combo], {}, "Clear lectures") == answer
+    after = converse_api.prompt_cache_stats
+    replay_usage = {k: after[k] - before[k] for k in after}
+    assert len(client.requests) - requests_before == 1, "replays must not reach Bedrock"
+    assert replay_usage['calls'] == 1, replay_usage
+
+    print(f"first call : {usages[0]}")
+    print(f"second call: {usages[1]}")
+    print(f"3 requests, 2 replayed: {replay_usage}")
+    print("✅ prompt prefix is cached across teacher preferences")
+
+if __name__ == '__main__':
+    main()
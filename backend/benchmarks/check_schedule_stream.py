@@ -0,0 +1,110 @@
+"""
+Check that identical schedule requests share one computation without hanging.
+
+Two identical requests to the SSE endpoint are sent one after the other
+(the second is answered from the singleflight result cache), followed by
+the blocking endpoint and a queued job for the same courses. Every one
+of them must finish with a "done" event / result and no error. Jobs that
+wait on an identical request still running must still time out and be
+cancellable. The schedule pipeline is replaced by a canned event
+generator, so no AWS or RMP access is needed.
+
+    python benchmarks/check_schedule_stream.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+
+BODY = {"courses": ["MATH 51", "PHYS 32"], "teacher_preference": "Clear lectures", "num_schedules": 1}
+SLOW_BODY = dict(BODY, teacher_preference="Slow")
+TIMEOUT = 10
+
+runs = []
+release_slow = threading.Event()
+
+def fake_schedule_events(**kwargs):
+    runs.append(kwargs)
+    if kwargs['teacher_preference'] == SLOW_BODY['teacher_preference']:
+        release_slow.wait(TIMEOUT * 3)
+    yield {'event': 'stage', 'stage': 'catalog', 'message': 'Loading course catalog'}
+    yield {'event': 'schedule', 'index': 0,
+           'option': {'schedule': [{'summary': 'MATH 51-1'}], 'pros': [], 'cons': []}}
+    yield {'event': 'analysis', 'index': 0, 'pros': ['Good fit'], 'cons': []}
+    yield {'event': 'done', 'count': 1}
+
+def within_timeout(label, fn):
+    """fn() on a thread; fails instead of hanging if it doesn't return in time."""
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.setdefault('value', fn()), daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    assert not thread.is_alive(), f"{label} did not finish within {TIMEOUT}s"
+    return outcome['value']
+
+def stream_events(client, body=BODY):
+    response = client.post('/api/generate-schedule/stream', json=body)
+    text = response.get_data(as_text=True)
+    return [block.split('\n')[0][len('event: '):] for block in text.strip().split('\n\n')]
+
+def wait_for_job(client, job_id):
+    deadline = time.time() + TIMEOUT
+    while True:
+        job = client.get(f'/api/jobs/{job_id}').get_json()['data']
+        if job['status'] not in (api.jobs.QUEUED, api.jobs.RUNNING):
+            return job
+        assert time.time() < deadline, f"job still {job['status']} after {TIMEOUT}s"
+        time.sleep(0.05)
+
+def check_waiting_jobs(client):
+    """Jobs following a slow identical request honour their timeout and DELETE."""
+    api.schedule_flights.wait_poll = 0.1
+    leader = threading.Thread(target=lambda: stream_events(client, SLOW_BODY), daemon=True)
+    leader.start()
+    while not any(run['teacher_preference'] == SLOW_BODY['teacher_preference'] for run in runs):
+        time.sleep(0.01)
+
+    args = api.schedule_request_args(SLOW_BODY)
+    job = api.job_queue.submit(dict(args, key=api.schedule_key(SLOW_BODY, args)), timeout=0.5)
+    job = wait_for_job(client, job.id)
+    assert job['status'] == api.jobs.TIMED_OUT, job
+
+    job_id = client.post('/api/jobs', json=SLOW_BODY).get_json()['job_id']
+    time.sleep(0.3)
+    client.delete(f'/api/jobs/{job_id}')
+    job = wait_for_job(client, job_id)
+    assert job['status'] == api.jobs.CANCELLED, job
+
+    release_slow.set()
+    leader.join(TIMEOUT)
+    print("waiting jobs: timed out and cancelled while the identical request ran")
+
+def main():
+    api.converse_api.iter_schedule_events = fake_schedule_events
+    client = api.app.test_client()
+
+    for attempt in (1, 2):
+        names = within_timeout(f"SSE request {attempt}", lambda: stream_events(client))
+        assert names[-1] == 'done' and 'error' not in names, f"SSE request {attempt}: {names}"
+        print(f"SSE request {attempt}: {' '.join(names)}")
+
+    response = within_timeout("blocking request", lambda: client.post('/api/generate-schedule', json=BODY))
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['data']['recommendations'][0]['pros'] == ['Good fit']
+
+    job_id = client.post('/api/jobs', json=BODY).get_json()['job_id']
+    job = wait_for_job(client, job_id)
+    assert job['status'] == api.jobs.SUCCEEDED, job
+
+    assert len(runs) == 1, f"pipeline ran {len(runs)} times for identical requests"
+
+    check_waiting_jobs(client)
+    print(f"coalescing: {api.schedule_flights.stats}")
+    print("✅ identical schedule requests share one run and all finish")
+
+if __name__ == '__main__':
+    main()
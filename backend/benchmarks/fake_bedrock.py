@@ -0,0 +1,103 @@
+"""
+Local stand-in for a boto3 bedrock-runtime client.
+
+FakeBedrockClient.converse_stream returns the same event shapes as the
+real ConverseStream API (messageStart, contentBlockDelta, contentBlockStop,
+messageStop, metadata) and emulates prompt caching: content up to a
+{"cachePoint": ...} block is hashed, and usage reports
+cacheWriteInputTokens the first time a prefix is seen and
+cacheReadInputTokens afterwards, with inputTokens counting only the rest.
+"""
+import hashlib
+import json
+import math
+import time
+
+def _block_text(block):
+    return block.get('text', '') if isinstance(block, dict) else ''
+
+def count_tokens(text):
+    return math.ceil(len(text) / 4)
+
+class FakeEventStream:
+    """Iterable of converse_stream events; close() stops generation."""
+
+    def __init__(self, events, ttft=0.0, tokens_per_sec=None):
+        self._events = events
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.closed = False
+
+    def __iter__(self):
+        if self.ttft:
+            time.sleep(self.ttft)
+        for event in self._events:
+            if self.closed:
+                return
+            if self.tokens_per_sec and 'contentBlockDelta' in event:
+                time.sleep(count_tokens(event['contentBlockDelta']['delta']['text']) / self.tokens_per_sec)
+            yield event
+
+    def close(self):
+        self.closed = True
+
+class FakeBedrockClient:
+    """
+    Args:
+        respond: Callable(request kwargs) -> response text, or a fixed string
+        ttft: Seconds before the first event
+        tokens_per_sec: Output speed (None for no delay)
+        chunk_chars: Characters per contentBlockDelta
+        min_cache_tokens: Prefixes shorter than this are not cached (the
+            real service has a per-model minimum)
+    """
+
+    def __init__(self, respond='[]', ttft=0.0, tokens_per_sec=None, chunk_chars=16, min_cache_tokens=0):
+        self.respond = respond
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.chunk_chars = chunk_chars
+        self.min_cache_tokens = min_cache_tokens
+        self.requests = []
+        self._cached_prefixes = set()
+
+    def _usage(self, messages, output_text):
+        seen = []
+        prefix_digest = None
+        prefix_tokens = 0
+        total_tokens = 0
+        for message in messages:
+            for block in message.get('content', []):
+                if 'cachePoint' in block:
+                    # Cache key: everything before the last cache point
+                    prefix_tokens = total_tokens
+                    prefix_digest = hashlib.sha256('\x00'.join(seen).encode()).hexdigest()
+                    continue
+                total_tokens += count_tokens(_block_text(block))
+                seen.append(json.dumps(block, sort_keys=True))
+        usage = {'inputTokens': total_tokens, 'outputTokens': count_tokens(output_text)}
+        if prefix_tokens and prefix_tokens >= self.min_cache_tokens:
+            key = (prefix_digest, prefix_tokens)
+            if key in self._cached_prefixes:
+                usage['cacheReadInputTokens'] = prefix_tokens
+            else:
+                self._cached_prefixes.add(key)
+                usage['cacheWriteInputTokens'] = prefix_tokens
+            usage['inputTokens'] = total_tokens - prefix_tokens
+        usage['totalTokens'] = total_tokens + usage['outputTokens']
+        return usage
+
+    def converse_stream(self, modelId, messages, inferenceConfig=None, **kwargs):
+        request = dict(kwargs, modelId=modelId, messages=messages, inferenceConfig=inferenceConfig)
+        self.requests.append(request)
+        text = self.respond(request) if callable(self.respond) else self.respond
+
+        events = [{'messageStart': {'role': 'assistant'}}]
+        for i in range(0, len(text), self.chunk_chars):
+            events.append({'contentBlockDelta': {'delta': {'text': text[i:i + self.chunk_chars]},
+                                                 'contentBlockIndex': 0}})
+        events.append({'contentBlockStop': {'contentBlockIndex': 0}})
+        events.append({'messageStop': {'stopReason': 'end_turn'}})
+        events.append({'metadata': {'usage': self._usage(messages, text),
+                                    'metrics': {'latencyMs': int(self.ttft * 1000)}}})
+        return {'stream': FakeEventStream(events, self.ttft, self.tokens_per_sec)}
@@ -0,0 +1,188 @@
+"""
+In-memory stand-in for the Google Calendar v3 service gcal.py uses.
+
+Supports calendarList().list(), calendars().insert(), events().insert /
+list / patch / update / delete and new_batch_http_request(). Every execute() (a
+whole batch counts once) sleeps for `latency` seconds, so round trips
+dominate the way they do against the real API. Calendars are shared by
+all FakeCalendarService objects built on the same FakeCalendarStore.
+"""
+import copy
+import itertools
+import json
+import random
+import threading
+import time
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+def http_error(status, reason):
+    """A googleapiclient HttpError as the API would raise it."""
+    content = json.dumps({'error': {'code': status, 'message': reason,
+                                    'errors': [{'reason': reason, 'message': reason}]}}).encode('utf-8')
+    return HttpError(httplib2.Response({'status': status}), content)
+
+class FakeCalendarStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calendars = {}  # id -> {"summary", "timeZone", "events": {id: event}}
+        self.ids = itertools.count(1)
+        self.calls = {'execute': 0, 'batch_items': 0}
+
+    def calendar(self, calendar_id):
+        calendar = self.calendars.get(calendar_id)
+        if calendar is None:
+            raise http_error(404, 'notFound')
+        return calendar
+
+class FakeRequest:
+    """An HttpRequest: nothing happens until execute()."""
+
+    def __init__(self, service, action):
+        self._service = service
+        self._action = action
+
+    def execute(self):
+        self._service._round_trip()
+        return self._action()
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self._service = service
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, request_id=None, callback=None):
+        if len(self._requests) >= 1000:
+            raise ValueError("Batch limit is 1000 requests")
+        self._requests.append((request, request_id or str(len(self._requests)), callback or self._callback))
+
+    def execute(self):
+        self._service._round_trip()
+        with self._service.store.lock:
+            self._service.store.calls['batch_items'] += len(self._requests)
+        for request, request_id, callback in self._requests:
+            if self._service._rate_limited():
+                callback(request_id, None, http_error(429, 'rateLimitExceeded'))
+                continue
+            try:
+                response, error = request._action(), None
+            except HttpError as e:
+                response, error = None, e
+            callback(request_id, response, error)
+
+class _Collection:
+    def __init__(self, service):
+        self._service = service
+        self._store = service.store
+
+class _CalendarList(_Collection):
+    def list(self, **kwargs):
+        def action():
+            with self._store.lock:
+                return {'items': [{'id': cid, 'summary': c['summary'], 'timeZone': c['timeZone']}
+                                  for cid, c in self._store.calendars.items()]}
+        return FakeRequest(self._service, action)
+
+class _Calendars(_Collection):
+    def insert(self, body):
+        def action():
+            with self._store.lock:
+                cid = f"cal{next(self._store.ids)}@group.calendar.google.com"
+                self._store.calendars[cid] = {'summary': body['summary'],
+                                              'timeZone': body.get('timeZone'), 'events': {}}
+                return {'id': cid, 'summary': body['summary'], 'timeZone': body.get('timeZone')}
+        return FakeRequest(self._service, action)
+
+def _matches_private(event, selector):
+    if not selector:
+        return True
+    key, _, value = selector.partition('=')
+    return event.get('extendedProperties', {}).get('private', {}).get(key) == value
+
+class _Events(_Collection):
+    def insert(self, calendarId, body):
+        def action():
+            with self._store.lock:
+                calendar = self._store.calendar(calendarId)
+                event = dict(copy.deepcopy(body), id=f"evt{next(self._store.ids)}")
+                calendar['events'][event['id']] = event
+                return copy.deepcopy(event)
+        return FakeRequest(self._service, action)
+
+    def list(self, calendarId, privateExtendedProperty=None, maxResults=250, pageToken=None, **kwargs):
+        def action():
+            with self._store.lock:
+                events = [e for e in self._store.calendar(calendarId)['events'].values()
+                          if _matches_private(e, privateExtendedProperty)]
+                start = int(pageToken or 0)
+                page = {'items': copy.deepcopy(events[start:start + maxResults])}
+                if start + maxResults < len(events):
+                    page['nextPageToken'] = str(start + maxResults)
+                return page
+        return FakeRequest(self._service, action)
+
+    def patch(self, calendarId, eventId, body):
+        def action():
+            with self._store.lock:
+                events = self._store.calendar(calendarId)['events']
+                if eventId not in events:
+                    raise http_error(404, 'notFound')
+                events[eventId].update(copy.deepcopy(body))
+                return copy.deepcopy(events[eventId])
+        return FakeRequest(self._service, action)
+
+    def update(self, calendarId, eventId, body):
+        def action():
+            with self._store.lock:
+                events = self._store.calendar(calendarId)['events']
+                if eventId not in events:
+                    raise http_error(404, 'notFound')
+                events[eventId] = dict(copy.deepcopy(body), id=eventId)
+                return copy.deepcopy(events[eventId])
+        return FakeRequest(self._service, action)
+
+    def delete(self, calendarId, eventId):
+        def action():
+            with self._store.lock:
+                events = self._store.calendar(calendarId)['events']
+                if events.pop(eventId, None) is None:
+                    raise http_error(410, 'deleted')
+                return ''
+        return FakeRequest(self._service, action)
+
+class FakeCalendarService:
+    """
+    Args:
+        store: FakeCalendarStore shared between services (one per thread in gcal)
+        latency: Seconds per HTTP round trip
+        rate_limit_ratio: Share of batched requests answered with 429
+    """
+
+    def __init__(self, store=None, latency=0.0, rate_limit_ratio=0.0, seed=0):
+        self.store = store or FakeCalendarStore()
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self._random = random.Random(seed)
+
+    def _rate_limited(self):
+        return bool(self.rate_limit_ratio) and self._random.random() < self.rate_limit_ratio
+
+    def _round_trip(self):
+        with self.store.lock:
+            self.store.calls['execute'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def calendarList(self):
+        return _CalendarList(self)
+
+    def calendars(self):
+        return _Calendars(self)
+
+    def events(self):
+        return _Events(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
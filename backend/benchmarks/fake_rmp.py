@@ -0,0 +1,140 @@
+"""
+Local GraphQL stub for RateMyProfessors.
+
+Answers the queries ratemyprof_info sends (TeacherSearchPaginationQuery,
+RatingsListQuery and their batched forms) with deterministic made-up
+teachers and ratings. Point ratemyprof_info at it by setting
+RMP_GRAPHQL_URL to RMPStub.url before importing ratemyprof_info.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TAGS = ["Clear grading criteria", "Caring", "Lots of homework", "Tough grader",
+        "Amazing lectures", "Participation matters", "Gives good feedback"]
+COMMENTS = ["Explains everything clearly and is always willing to help in office hours.",
+            "Homework is long but the exams are fair.",
+            "Lectures move fast, read ahead.",
+            "Really cares about students, would take again."]
+
+def _seed(text):
+    return int(hashlib.sha1(text.encode('utf-8')).hexdigest()[:8], 16)
+
+def teacher_node(name):
+    """Made-up but stable RMP teacher node for a "First Last" search text."""
+    first_name, _, last_name = name.partition(' ')
+    seed = _seed(name.lower())
+    return {
+        "firstName": first_name,
+        "lastName": last_name,
+        "id": f"VGVhY2hlci0{seed}",
+        "department": "Mathematics",
+        "avgRating": round(2.0 + (seed % 30) / 10, 1),
+        "avgDifficulty": round(1.5 + (seed % 35) / 10, 1),
+        "numRatings": 5 + seed % 80,
+        "wouldTakeAgainPercent": float(40 + seed % 60),
+        "school": {"name": "Santa Clara University"},
+    }
+
+def rating_edges(teacher_id, count):
+    seed = _seed(teacher_id)
+    edges = []
+    for i in range(min(count, 5 + seed % 10)):
+        edges.append({"node": {
+            "comment": COMMENTS[(seed + i) % len(COMMENTS)],
+            "ratingTags": "--".join(TAGS[(seed + i + j) % len(TAGS)] for j in range(2)),
+            "class": f"MATH{10 + (seed + i) % 90}",
+            "date": f"2024-{1 + (seed + i) % 12:02d}-15 00:00:00 +0000 UTC",
+        }})
+    return edges
+
+def answer(query, variables, not_found_ratio=0.0):
+    """GraphQL response for one request."""
+    match = re.search(r"query\s+(\w+)", query)
+    operation = match.group(1) if match else ''
+    count = variables.get("count", 10)
+
+    def search(text):
+        if not_found_ratio and (_seed(text) % 100) < not_found_ratio * 100:
+            return {"teachers": {"edges": []}}
+        return {"teachers": {"edges": [{"node": teacher_node(text)}]}}
+
+    if operation == "TeacherSearchPaginationQuery":
+        return {"data": {"search": search(variables["query"]["text"])}}
+    if operation == "BatchTeacherSearch":
+        return {"data": {
+            f"s{name[1:]}": search(value["text"])
+            for name, value in variables.items() if re.fullmatch(r"q\d+", name)
+        }}
+    if operation == "RatingsListQuery":
+        return {"data": {"node": {"__typename": "Teacher",
+                                  "ratings": {"edges": rating_edges(variables["id"], count)}}}}
+    if operation == "BatchRatingsList":
+        return {"data": {
+            f"n{name[2:]}": {"__typename": "Teacher", "ratings": {"edges": rating_edges(value, count)}}
+            for name, value in variables.items() if re.fullmatch(r"id\d+", name)
+        }}
+    return {"errors": [{"message": f"Unknown operation {operation!r}"}]}
+
+class RMPStub:
+    """
+    GraphQL server on localhost, run on a background thread.
+
+    Args:
+        latency: Seconds added to every response
+        not_found_ratio: Share of names the search does not find
+    """
+
+    def __init__(self, latency=0.0, not_found_ratio=0.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.not_found_ratio = not_found_ratio
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with stub._lock:
+                    stub.requests += 1
+                try:
+                    payload = json.loads(body)
+                    data = json.dumps(answer(payload.get("query", ""), payload.get("variables") or {},
+                                             stub.not_found_ratio)).encode('utf-8')
+                    status = 200
+                except (ValueError, KeyError, TypeError) as e:
+                    data = json.dumps({"errors": [{"message": str(e)}]}).encode('utf-8')
+                    status = 400
+                if stub.latency:
+                    time.sleep(stub.latency)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/graphql"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='rmp-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,89 @@
+"""
+Directory-backed stand-in for a boto3 S3 client.
+
+Objects live at <root>/<bucket>/<key>. get_object honours IfNoneMatch the
+way S3 does (a ClientError with HTTP status 304), so catalog.CatalogCache
+revalidation can be exercised offline.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+def _error(code, message, status, operation):
+    return ClientError(
+        {'Error': {'Code': code, 'Message': message}, 'ResponseMetadata': {'HTTPStatusCode': status}},
+        operation
+    )
+
+class FakeS3Client:
+    """
+    Args:
+        root: Directory holding one subdirectory per bucket
+        latency: Seconds added to every call (request round trip)
+        bytes_per_sec: Download speed for object bodies (None for no delay)
+    """
+
+    def __init__(self, root, latency=0.0, bytes_per_sec=None):
+        self.root = root
+        self.latency = latency
+        self.bytes_per_sec = bytes_per_sec
+        self.calls = {'get_object': 0, 'head_object': 0, 'not_modified': 0}
+        self._lock = threading.Lock()
+        self._etags = {}
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def _etag(self, path):
+        # Cached on (mtime, size), like S3 hashing on upload rather than per read
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._etags.get(path)
+            if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+                return cached[1]
+        with open(path, 'rb') as f:
+            etag = f'"{hashlib.md5(f.read()).hexdigest()}"'
+        with self._lock:
+            self._etags[path] = ((stat.st_mtime_ns, stat.st_size), etag)
+        return etag
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+
+    def put_object(self, Bucket, Key, Body):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(Body if isinstance(Body, bytes) else Body.read())
+        return {'ETag': self._etag(path)}
+
+    def head_object(self, Bucket, Key):
+        self._count('head_object')
+        if self.latency:
+            time.sleep(self.latency)
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise _error('404', 'Not Found', 404, 'HeadObject')
+        return {'ETag': self._etag(path), 'ContentLength': os.path.getsize(path)}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        self._count('get_object')
+        if self.latency:
+            time.sleep(self.latency)
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise _error('NoSuchKey', 'The specified key does not exist.', 404, 'GetObject')
+        etag = self._etag(path)
+        if IfNoneMatch is not None and IfNoneMatch == etag:
+            self._count('not_modified')
+            raise _error('304', 'Not Modified', 304, 'GetObject')
+        with open(path, 'rb') as f:
+            body = f.read()
+        if self.bytes_per_sec:
+            time.sleep(len(body) / self.bytes_per_sec)
+        return {'ETag': etag, 'ContentLength': len(body), 'Body': io.BytesIO(body)}
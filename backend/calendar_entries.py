@@ -0,0 +1,79 @@
+import csv
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime
+
+@dataclass(frozen=True)
+class ScheduleEntry:
+    """
+    One calendar entry of a schedule option, with dates parsed once.
+
+    Mirrors the summary/location/description/start/end/days_of_week/end_sem
+    dicts from schedule_solver.schedule_entries. start/end are naive local
+    times (America/Los_Angeles) and None for TBA sections.
+    """
+    summary: str
+    location: str = ''
+    description: str = ''
+    start: datetime | None = None
+    end: datetime | None = None
+    days_of_week: tuple = ()
+    end_sem: date | None = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build an entry from an API/CSV dict.
+
+        days_of_week may be a list or a comma-separated string; empty
+        strings count as missing.
+
+        Raises:
+            ValueError: on malformed dates
+        """
+        days = data.get('days_of_week') or ()
+        if isinstance(days, str):
+            days = [d.strip() for d in days.split(',')]
+        end_sem = data.get('end_sem') or None
+        return cls(
+            summary=str(data.get('summary') or ''),
+            location=str(data.get('location') or ''),
+            description=str(data.get('description') or ''),
+            start=_parse_datetime(data.get('start')),
+            end=_parse_datetime(data.get('end')),
+            days_of_week=tuple(d.upper() for d in days if d),
+            end_sem=date.fromisoformat(end_sem[:10]) if end_sem else None,
+        )
+
+    @property
+    def is_timed(self):
+        """False for TBA/online sections, which have nothing to put on a calendar."""
+        return self.start is not None and self.end is not None
+
+    def rrule(self):
+        """Weekly RRULE on the meeting days until the end of the term, or None."""
+        if not self.days_of_week or not self.end_sem:
+            return None
+        return (f"RRULE:FREQ=WEEKLY;BYDAY={','.join(self.days_of_week)};"
+                f"UNTIL={self.end_sem.strftime('%Y%m%d')}T235959Z")
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+def parse_entries(rows):
+    """ScheduleEntry for each dict in rows (see ScheduleEntry.from_dict)."""
+    return [ScheduleEntry.from_dict(row) for row in rows]
+
+def entries_from_csv(filename):
+    """Read a schedule.csv written by converse.py."""
+    with open(filename, newline='') as csvfile:
+        return parse_entries(csv.DictReader(csvfile))
+
+def term_of(entries):
+    """Default term for entries: their most common end_sem month (e.g. "2025-12")."""
+    months = Counter(e.end_sem.strftime('%Y-%m') for e in entries if e.end_sem)
+    return months.most_common(1)[0][0] if months else 'default'
@@ -0,0 +1,367 @@
+import io
+import os
+import threading
+import time
+
+import boto3
+import pandas as pd
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+from course_index import SectionIndex
+import metrics
+
+try:
+    import pyarrow as pa
+except ImportError:  # compiled catalogs are optional; fall back to XLSX
+    pa = None
+
+# Load AWS credentials once at module level
+load_dotenv()
+access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
+secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+
+BUCKET_NAME = 'schedulebuildertool'
+S3_KEY = 'classes/SCU_Find_Course_Sections.xlsx'
+
+# How long a cached catalog is trusted before asking S3 whether it changed
+REVALIDATE_SECONDS = float(os.getenv("CATALOG_REVALIDATE_SECONDS", "300"))
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPILED_CATALOG_PATH = os.getenv(
+    "CATALOG_COMPILED_PATH",
+    os.path.join(BACKEND_DIR, 'SCU_Find_Course_Sections.arrow')
+)
+
+COLUMNS_OF_INTEREST = [
+    "Course Section",
+    "All Instructors",
+    "Section Status",
+    "Enrolled/Capacity",
+    "Meeting Patterns",
+    "Locations",
+    "Start Date",
+    "End Date"
+]
+
+DATE_COLUMNS = ["Start Date", "End Date"]
+
+def make_s3_client():
+    return boto3.client(
+        's3',
+        aws_access_key_id=access_key_id,
+        aws_secret_access_key=secret_access_key,
+        region_name="us-east-1"
+    )
+
+def project_columns(df):
+    """Keep only the columns the schedule pipeline uses."""
+    return df[[c for c in COLUMNS_OF_INTEREST if c in df.columns]]
+
+def normalize_catalog(df):
+    """
+    Project to COLUMNS_OF_INTEREST and give every column a fixed type:
+    dates become datetime64, everything else nullable strings.
+    """
+    df = project_columns(df).copy()
+    for col in df.columns:
+        if col in DATE_COLUMNS:
+            # Each value is parsed on its own: "9/22/2025" next to ISO dates
+            # must not be coerced to NaT
+            parsed = pd.to_datetime(df[col], errors='coerce', format='mixed')
+            given = df[col].notna() & (df[col].astype("string").str.strip() != '')
+            unparsed = int((given & parsed.isna()).sum())
+            if unparsed:
+                print(f"⚠️ {unparsed} {col} values are not dates and were left empty")
+            df[col] = parsed
+        else:
+            df[col] = df[col].astype("string")
+    return df.reset_index(drop=True)
+
+def read_excel_catalog(source):
+    """
+    Parse the course sections spreadsheet.
+
+    Args:
+        source: Path or file-like object holding the XLSX workbook
+
+    Returns:
+        DataFrame restricted to COLUMNS_OF_INTEREST
+    """
+    return normalize_catalog(pd.read_excel(source, usecols=lambda c: c in COLUMNS_OF_INTEREST))
+
+def _catalog_schema(columns, source_etag=None):
+    fields = [
+        pa.field(col, pa.timestamp('ms') if col in DATE_COLUMNS else pa.string())
+        for col in columns
+    ]
+    metadata = {'source_key': S3_KEY}
+    if source_etag:
+        metadata['source_etag'] = source_etag
+    return pa.schema(fields, metadata=metadata)
+
+def compile_catalog(source, out_path=COMPILED_CATALOG_PATH, source_etag=None):
+    """
+    Compile the XLSX catalog into an uncompressed Arrow IPC file.
+
+    The file holds typed columns for COLUMNS_OF_INTEREST only and can be
+    memory-mapped, so loading it skips openpyxl entirely.
+
+    Args:
+        source: XLSX path/file-like object, or an already parsed DataFrame
+        out_path: Where to write the compiled file
+        source_etag: S3 ETag of the workbook, recorded to detect stale files
+
+    Returns:
+        The normalized DataFrame that was written
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to compile the course catalog")
+    df = normalize_catalog(source) if isinstance(source, pd.DataFrame) else read_excel_catalog(source)
+    schema = _catalog_schema(df.columns, source_etag)
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+    # Write next to the target and rename so readers never see a partial file
+    tmp_path = f"{out_path}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, out_path)
+    return df
+
+def compiled_catalog_etag(path=COMPILED_CATALOG_PATH):
+    """Return the source ETag recorded in a compiled catalog, or None."""
+    if pa is None or not os.path.exists(path):
+        return None
+    with pa.memory_map(path) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    etag = metadata.get(b'source_etag')
+    return etag.decode() if etag else None
+
+def load_compiled_catalog(path=COMPILED_CATALOG_PATH):
+    """
+    Memory-map a compiled catalog and expose it as a DataFrame.
+
+    Columns stay Arrow-backed (pd.ArrowDtype), so the data is read straight
+    from the mapped file without being copied into Python objects.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to load a compiled course catalog")
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+def has_compiled_catalog(path=COMPILED_CATALOG_PATH):
+    return pa is not None and os.path.exists(path)
+
+class CatalogCache:
+    """
+    Process-wide cache of the parsed course catalog.
+
+    The DataFrame is kept in memory and only re-downloaded when S3 reports a
+    new ETag. Revalidation is a conditional GET (If-None-Match) issued at most
+    once every `revalidate_seconds`; a 304 answer just resets the timer.
+    """
+
+    def __init__(self, bucket=BUCKET_NAME, key=S3_KEY, revalidate_seconds=REVALIDATE_SECONDS,
+                 client_factory=make_s3_client, compiled_path=COMPILED_CATALOG_PATH):
+        self.bucket = bucket
+        self.key = key
+        self.compiled_path = compiled_path
+        self.revalidate_seconds = revalidate_seconds
+        self._client_factory = client_factory
+        self._client = None
+        self._lock = threading.Lock()
+        # Held while talking to S3, so only one request revalidates at a time
+        self._refresh_lock = threading.Lock()
+        self._df = None
+        self._index = None
+        self._etag = None
+        self._checked_at = 0.0
+        self.stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'not_modified': 0}
+
+    @property
+    def etag(self):
+        return self._etag
+
+    def _s3(self):
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def _load_compiled(self):
+        """
+        Load the compiled catalog on a cold start if it matches the S3 object.
+
+        A file without a recorded source ETag (compiled from a local
+        workbook) is only used when S3 can't be reached, and then without
+        an ETag, so the next revalidation downloads the workbook.
+
+        Returns:
+            (DataFrame, etag or None), or None if the file can't be used
+        """
+        if not self.compiled_path or not has_compiled_catalog(self.compiled_path):
+            return None
+        try:
+            compiled_etag = compiled_catalog_etag(self.compiled_path)
+            try:
+                current_etag = self._s3().head_object(Bucket=self.bucket, Key=self.key)['ETag']
+            except Exception as e:
+                # S3 unreachable: a compiled copy is still better than nothing
+                print(f"⚠️ Could not check catalog ETag, using compiled file: {e}")
+                current_etag = None
+            if current_etag and compiled_etag != current_etag:
+                return None
+            return load_compiled_catalog(self.compiled_path), compiled_etag
+        except Exception as e:
+            print(f"⚠️ Could not use compiled catalog {self.compiled_path}: {e}")
+            return None
+
+    def _store_compiled(self, df, etag):
+        if not self.compiled_path or pa is None:
+            return
+        try:
+            compile_catalog(df, self.compiled_path, source_etag=etag)
+        except Exception as e:
+            print(f"⚠️ Could not write compiled catalog {self.compiled_path}: {e}")
+
+    def _fetch(self, etag=None):
+        """Conditional GET; returns (etag, body bytes) or None if unchanged."""
+        kwargs = {'Bucket': self.bucket, 'Key': self.key}
+        if etag:
+            kwargs['IfNoneMatch'] = etag
+        try:
+            obj = self._s3().get_object(**kwargs)
+        except ClientError as e:
+            status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+            if status == 304 or e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+                return None
+            raise
+        return obj['ETag'], obj['Body'].read()
+
+    def _fresh(self):
+        """The cached DataFrame if it was checked recently enough (call with _lock held)."""
+        if self._df is not None and time.monotonic() - self._checked_at < self.revalidate_seconds:
+            self.stats['hits'] += 1
+            return self._df
+        return None
+
+    def get(self):
+        """
+        Return the current catalog DataFrame, refreshing it from S3 if needed.
+
+        Only one thread talks to S3 at a time, and never while holding the
+        lock readers need: while a revalidation is in flight, other callers
+        get the copy already in memory (and only wait on a cold start).
+
+        Callers must treat the returned DataFrame as read-only; it is shared
+        by every request in the process.
+        """
+        with self._lock:
+            df = self._fresh()
+            if df is not None:
+                return df
+            cached = self._df
+
+        if not self._refresh_lock.acquire(blocking=cached is None):
+            with self._lock:
+                self.stats['hits'] += 1
+            return cached
+        try:
+            return self._refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self):
+        # Called with _refresh_lock held
+        with self._lock:
+            df = self._fresh()
+            if df is not None:
+                return df  # another thread just refreshed it
+            cached, etag = self._df, self._etag
+
+        now = time.monotonic()
+        if cached is None:
+            compiled = self._load_compiled()
+            if compiled is not None:
+                with self._lock:
+                    self._df, self._etag = compiled
+                    self._checked_at = now
+                    self.stats['misses'] += 1
+                    return self._df
+
+        try:
+            with metrics.stage('s3_download'):
+                fetched = self._fetch(etag if cached is not None else None)
+        except Exception as e:
+            if cached is not None:
+                # Serve the last good copy rather than failing the request
+                print(f"⚠️ Catalog revalidation failed, serving cached copy: {e}")
+                with self._lock:
+                    self._checked_at = now
+                    self.stats['hits'] += 1
+                return cached
+            raise Exception(f"Failed to download course data from S3: {e}")
+
+        if fetched is None:
+            with self._lock:
+                self._checked_at = now
+                self.stats['not_modified'] += 1
+                self.stats['hits'] += 1
+            return cached
+
+        etag, body = fetched
+        with metrics.stage('parse_catalog'):
+            df = read_excel_catalog(io.BytesIO(body))
+        with self._lock:
+            self.stats['misses' if cached is None else 'refreshes'] += 1
+            self._df = df
+            self._etag = etag
+            self._checked_at = now
+        self._store_compiled(df, etag)
+        return df
+
+    def get_indexed(self):
+        """
+        Return (catalog DataFrame, SectionIndex) for the same catalog version.
+
+        The index is built once per catalog version and reused until the
+        next refresh.
+        """
+        df = self.get()
+        with self._lock:
+            if self._index is None or self._index[0] is not df:
+                self._index = (df, SectionIndex.from_dataframe(df))
+            return self._index
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = 0.0
+
+_catalog_cache = CatalogCache()
+
+def get_catalog():
+    """Return the shared, column-projected course catalog."""
+    return _catalog_cache.get()
+
+def get_indexed_catalog():
+    """Return the shared catalog together with its course-section index."""
+    return _catalog_cache.get_indexed()
+
+def get_catalog_cache():
+    return _catalog_cache
+
+def catalog_stats():
+    """Hit/miss/refresh counters for the shared catalog cache."""
+    return dict(_catalog_cache.stats, etag=_catalog_cache.etag)
+
+if __name__ == '__main__':
+    # Ingest step: python catalog.py [workbook.xlsx] [output.arrow]
+    # Without a workbook path the current catalog is downloaded from S3.
+    import sys
+    out_path = sys.argv[2] if len(sys.argv) > 2 else COMPILED_CATALOG_PATH
+    if len(sys.argv) > 1:
+        df = compile_catalog(sys.argv[1], out_path)
+    else:
+        obj = make_s3_client().get_object(Bucket=BUCKET_NAME, Key=S3_KEY)
+        df = compile_catalog(io.BytesIO(obj['Body'].read()), out_path, source_etag=obj['ETag'])
+    print(f"✅ Compiled {len(df)} sections to {out_path}")
@@ -1,11 +1,14 @@
 import re
 import boto3
-import pandas as pd
 import os
 from dotenv import load_dotenv
 import json
 import ratemyprof_info
 import gcal
+import catalog
+import prompt_encoding
+import json_stream
+from course_index import SectionIndex, CourseNotFoundError
 import csv
 
 # === Load AWS credentials ===
@@ -25,46 +28,43 @@ if not secret_access_key or secret_access_key == "your_secret_key_here":
     exit(1)
 
 # === S3 setup ===
-bucket_name = 'schedulebuildertool'
-s3_key = 'classes/SCU_Find_Course_Sections.xlsx'
+bucket_name = catalog.BUCKET_NAME
+s3_key = catalog.S3_KEY
 local_file = 'SCU_Find_Course_Sections.xlsx'
 
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=access_key_id,
-    aws_secret_access_key=secret_access_key,
-    region_name="us-east-1"
-)
-
-# === Download and read Excel ===
-print("Downloading Excel file from S3...")
-try:
-    s3_client.download_file(bucket_name, s3_key, local_file)
-except Exception as e:
-    print(f"ERROR accessing S3 bucket: {e}")
-    print("\nTroubleshooting:")
-    print("1. Check that your AWS credentials in .env are correct")
-    print("2. Verify your credentials have S3 read permissions")
-    print("3. Make sure the bucket 'schedulebuildertool' exists")
-    print("4. Check that the file 'classes/SCU_Find_Course_Sections.xlsx' exists in the bucket")
-    exit(1)
-print("File downloaded successfully.\n")
-
-# === Read relevant data ===
-df = pd.read_excel(local_file)
-columns_of_interest = [
-    "Course Section",
-    "All Instructors",
-    "Section Status",
-    "Enrolled/Capacity",
-    "Meeting Patterns",
-    "Locations",
-    "Start Date",
-    "End Date"
-]
-
-# Only keep valid columns
-df = df[[c for c in columns_of_interest if c in df.columns]]
+# === Load course data ===
+if catalog.has_compiled_catalog():
+    # Compiled Arrow catalog (see `python catalog.py`): memory-mapped, no openpyxl
+    print(f"Loading compiled catalog {catalog.COMPILED_CATALOG_PATH}...")
+    df = catalog.load_compiled_catalog()
+    print("Catalog loaded.\n")
+else:
+    s3_client = boto3.client(
+        's3',
+        aws_access_key_id=access_key_id,
+        aws_secret_access_key=secret_access_key,
+        region_name="us-east-1"
+    )
+
+    # === Download and read Excel ===
+    print("Downloading Excel file from S3...")
+    try:
+        s3_client.download_file(bucket_name, s3_key, local_file)
+    except Exception as e:
+        print(f"ERROR accessing S3 bucket: {e}")
+        print("\nTroubleshooting:")
+        print("1. Check that your AWS credentials in .env are correct")
+        print("2. Verify your credentials have S3 read permissions")
+        print("3. Make sure the bucket 'schedulebuildertool' exists")
+        print("4. Check that the file 'classes/SCU_Find_Course_Sections.xlsx' exists in the bucket")
+        exit(1)
+    print("File downloaded successfully.\n")
+
+    # === Read relevant data ===
+    df = catalog.read_excel_catalog(local_file)
+
+    # Clean up downloaded file
+    os.remove(local_file)
 
 # === Collect user preferences ===
 print("="*60)
@@ -77,36 +77,36 @@ num_schedules = input("How many schedule options do you want? ").strip()
 
 # === Filter for user-specified courses ===
 if specific_courses:
-    course_keywords = [c.strip() for c in specific_courses.split(',')]
-    mask = pd.Series(False, index=df.index)
-    
-    for keyword in course_keywords:
-        pattern = f"{keyword}-"
-        mask |= df["Course Section"].str.contains(pattern, case=False, na=False, regex=False)
-    
-    filtered_df = df[mask]
+    course_keywords = [c.strip() for c in specific_courses.split(',') if c.strip()]
+    section_index = SectionIndex.from_dataframe(df)
+    try:
+        filtered_df, unmatched = section_index.select(df, course_keywords)
+    except CourseNotFoundError as e:
+        print(f"⚠️ {e}")
+        exit(1)
     
-    if filtered_df.empty:
-        print(f"⚠️ No matching courses found for: {course_keywords}")
-        filtered_df = df
+    if unmatched:
+        print(f"⚠️ No matching courses found for: {unmatched}")
 else:
     filtered_df = df
 
 print("Generating schedules...")
 
 # === Summarize course data for Claude ===
+# Compact "|"-separated table with repeated values interned, fitted to a
+# token budget (open sections first, spread across courses)
+catalog_table, included_rows, omitted_rows = prompt_encoding.encode_catalog(filtered_df)
+if omitted_rows:
+    print(f"⚠️ Only {included_rows} of {len(filtered_df)} sections fit the prompt budget")
+
 summary = f"""
 COURSE DATA SUMMARY:
 - Total matching sections: {len(filtered_df)}
-- Columns: {', '.join(filtered_df.columns.tolist())}
+- One section per line, "|"-separated; I/L/D ids refer to the lists above the header
 
-Sample of matching data:
-{filtered_df.head(20).to_string(index=False)}
+{catalog_table}
 """
 
-# Clean up downloaded file
-os.remove(local_file)
-
 # === Prepare Bedrock client ===
 client = boto3.client(
     service_name="bedrock-runtime",
@@ -133,14 +133,8 @@ def extract_json_from_response(text):
     except json.JSONDecodeError:
         pass
     
-    json_pattern = r'\[[\s\S]*?\]'
-    matches = re.findall(json_pattern, text)
-    for match in matches:
-        try:
-            return json.loads(match)
-        except json.JSONDecodeError:
-            continue
-    return None
+    # Tolerates surrounding prose, nested arrays and truncated output
+    return json_stream.parse_json_array(text) or None
 
 # === Step 1: Get course sections and professor info ===
 prompt1 = f"""
@@ -177,6 +171,9 @@ for chunk in response1["stream"]:
         delta = chunk["contentBlockDelta"]["delta"]
         if delta.get("text"):
             claude_output1 += delta["text"]
+    elif "metadata" in chunk:
+        prompt_encoding.log_token_usage("step 1", prompt_encoding.estimate_tokens(prompt1),
+                                        chunk["metadata"].get("usage"))
 
 all_sections = extract_json_from_response(claude_output1)
 
@@ -211,8 +208,8 @@ AVAILABLE COURSE SECTIONS AND PROFESSORS:
     for i, section in enumerate(all_sections)
 ], indent=2)}
 
-ORIGINAL DATA WITH DATES AND TIMES:
-{filtered_df[['Course Section', 'Meeting Patterns', 'Locations', 'Start Date', 'End Date']].to_string(index=False)}
+ORIGINAL DATA WITH DATES AND TIMES ("|"-separated; L/D ids refer to the lists above the header):
+{prompt_encoding.encode_catalog(filtered_df, ['Course Section', 'Meeting Patterns', 'Locations', 'Start Date', 'End Date'])[0]}
 
 TASK:
 Create {num_schedules} different course schedules. For each schedule, also provide pros and cons.
@@ -259,9 +256,11 @@ for chunk in response2["stream"]:
         delta = chunk["contentBlockDelta"]["delta"]
         if delta.get("text"):
             schedule_output += delta["text"]
+    elif "metadata" in chunk:
+        prompt_encoding.log_token_usage("step 2", prompt_encoding.estimate_tokens(schedule_prompt),
+                                        chunk["metadata"].get("usage"))
 
-json_str = schedule_output[schedule_output.find("["):schedule_output.rfind("]")+1] 
-schedules_with_analysis = json.loads(json_str)
+schedules_with_analysis = json_stream.parse_json_array(schedule_output)
 
 # === Parse schedules with pros/cons ===
 total_schedules = []
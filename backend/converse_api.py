@@ -1,10 +1,20 @@
 import re
+import time
 import boto3
 import pandas as pd
 import os
 from dotenv import load_dotenv
 import json
 import ratemyprof_info
+import catalog
+import meeting_patterns
+import schedule_solver
+import professor_digest
+import prompt_encoding
+import json_stream
+import llm_cache
+import timeslots
+import metrics
 import csv
 
 # Load AWS credentials once at module level
@@ -12,6 +22,30 @@ load_dotenv()
 access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
 secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
 
+MODEL_ID = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
+
+# Put a Bedrock prompt cache checkpoint after the part of the analysis
+# prompt that only depends on the course set
+PROMPT_CACHE = os.getenv("BEDROCK_PROMPT_CACHE", "1").lower() in ("1", "true", "yes")
+
+# Bedrock prompt cache token counts reported by stream metadata events
+prompt_cache_stats = {'calls': 0, 'cache_read_tokens': 0, 'cache_write_tokens': 0, 'input_tokens': 0}
+
+# Characters of analysis output read after the last expected option
+# before the stream is closed
+TRAILING_TEXT_LIMIT = 256
+
+# (metrics "kind" label, usage field) for bedrock_tokens_total
+TOKEN_USAGE_FIELDS = (
+    ('input', 'inputTokens'),
+    ('output', 'outputTokens'),
+    ('cache_read', 'cacheReadInputTokens'),
+    ('cache_write', 'cacheWriteInputTokens'),
+)
+
+# Opt-in: send rows the meeting-pattern parser can't handle to Claude
+LLM_SECTION_FALLBACK = os.getenv("SECTION_PARSE_LLM_FALLBACK", "").lower() in ("1", "true", "yes")
+
 def split_name(full_name: str) -> tuple[str, str] | None:
     parts = [p for p in re.split(r"\s+", full_name.strip()) if p]
     if len(parts) < 2:
@@ -27,14 +61,8 @@ def extract_json_from_response(text):
     except json.JSONDecodeError:
         pass
     
-    json_pattern = r'\[[\s\S]*?\]'
-    matches = re.findall(json_pattern, text)
-    for match in matches:
-        try:
-            return json.loads(match)
-        except json.JSONDecodeError:
-            continue
-    return None
+    # Tolerates surrounding prose, nested arrays and truncated output
+    return json_stream.parse_json_array(text) or None
 
 def times_overlap(schedule1, schedule2):
     """
@@ -44,38 +72,9 @@ def times_overlap(schedule1, schedule2):
         schedule1, schedule2: Schedule entries with start, end, and days_of_week
         
     Returns:
-        True if they overlap, False otherwise
+        True if they meet at the same time on a shared day, False otherwise
     """
-    # Check if they share any days
-    days1 = set(schedule1.get('days_of_week', []))
-    days2 = set(schedule2.get('days_of_week', []))
-    
-    if not days1 or not days2 or not days1.intersection(days2):
-        return False
-    
-    # Check if times overlap
-    try:
-        start1 = schedule1.get('start')
-        end1 = schedule1.get('end')
-        start2 = schedule2.get('start')
-        end2 = schedule2.get('end')
-        
-        if not all([start1, end1, start2, end2]):
-            return False
-        
-        # Parse ISO datetime strings
-        from datetime import datetime
-        dt_start1 = datetime.fromisoformat(start1)
-        dt_end1 = datetime.fromisoformat(end1)
-        dt_start2 = datetime.fromisoformat(start2)
-        dt_end2 = datetime.fromisoformat(end2)
-        
-        # Check if time ranges overlap
-        # Two ranges overlap if: start1 < end2 AND start2 < end1
-        return dt_start1 < dt_end2 and dt_start2 < dt_end1
-        
-    except (ValueError, AttributeError):
-        return False
+    return timeslots.entries_overlap(schedule1, schedule2)
 
 def check_schedule_validity(schedule):
     """
@@ -90,13 +89,7 @@ def check_schedule_validity(schedule):
     if not schedule or len(schedule) < 2:
         return True
     
-    # Check all pairs for overlaps
-    for i in range(len(schedule)):
-        for j in range(i + 1, len(schedule)):
-            if times_overlap(schedule[i], schedule[j]):
-                return False
-    
-    return True
+    return timeslots.schedule_is_valid(schedule)
 
 def filter_valid_schedules(schedules):
     """
@@ -114,86 +107,101 @@ def filter_valid_schedules(schedules):
             valid_schedules.append(schedule_option)
     return valid_schedules
 
-def generate_schedules(specific_courses: str, teacher_preference: str, num_schedules: int = 3):
+def converse_stream(client, fresh=False, **request):
     """
-    Generate course schedules using Claude AI and RateMyProfessor data.
-    
+    client.converse_stream through the on-disk response cache (see llm_cache).
+
+    Entries are keyed on the request and the catalog ETag; fresh=True
+    skips the lookup for callers that want a new answer.
+    """
+    started_at = time.perf_counter()
+    if not llm_cache.ENABLED:
+        response = client.converse_stream(**request)
+    else:
+        response = llm_cache.get_cache().converse_stream(
+            client, catalog_etag=catalog.get_catalog_cache().etag, fresh=fresh, **request
+        )
+    # For time-to-first-token in iter_stream_text
+    return dict(response, startedAt=started_at)
+
+def iter_stream_text(response, label, estimated_tokens=None):
+    """
+    Yield the text deltas of a converse_stream response as they arrive.
+
+    Closing the generator early (e.g. breaking out of the loop) closes the
+    underlying event stream, so Bedrock stops generating.
+
     Args:
-        specific_courses: Comma-separated course names (e.g., "MATH 51, PHYS 32")
-        teacher_preference: Description of what user wants in a teacher
-        num_schedules: Number of schedule options to generate
-        
-    Returns:
-        List of schedule options with pros/cons
+        response: converse_stream response
+        label: Name of the call, for the token usage log line
+        estimated_tokens: prompt_encoding.estimate_tokens() of the prompt
     """
-    # Setup S3 client
-    bucket_name = 'schedulebuildertool'
-    s3_key = 'classes/SCU_Find_Course_Sections.xlsx'
-    local_file = 'SCU_Find_Course_Sections.xlsx'
-    
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=access_key_id,
-        aws_secret_access_key=secret_access_key,
-        region_name="us-east-1"
-    )
-    
-    # Download Excel file
+    stream = response["stream"]
+    started_at = response.get("startedAt") or time.perf_counter()
+    # Replayed LLM cache entries carry the recorded call's metadata; they
+    # are no Bedrock call, so they count as a replay and leave the token,
+    # latency and prompt cache numbers alone
+    replayed = isinstance(stream, llm_cache.ReplayStream)
+    first_token = False
+    usage = None
     try:
-        s3_client.download_file(bucket_name, s3_key, local_file)
-    except Exception as e:
-        raise Exception(f"Failed to download course data from S3: {e}")
-    
-    # Read and filter data
-    df = pd.read_excel(local_file)
-    columns_of_interest = [
-        "Course Section",
-        "All Instructors",
-        "Section Status",
-        "Enrolled/Capacity",
-        "Meeting Patterns",
-        "Locations",
-        "Start Date",
-        "End Date"
-    ]
-    df = df[[c for c in columns_of_interest if c in df.columns]]
-    
-    # Filter for specified courses
-    if specific_courses:
-        course_keywords = [c.strip() for c in specific_courses.split(',')]
-        mask = pd.Series(False, index=df.index)
-        for keyword in course_keywords:
-            pattern = f"{keyword}-"
-            mask |= df["Course Section"].str.contains(pattern, case=False, na=False, regex=False)
-        filtered_df = df[mask]
-        if filtered_df.empty:
-            filtered_df = df  # Fallback to all courses if none found
-    else:
-        filtered_df = df
-    
-    # Summarize data for Claude
+        for chunk in stream:
+            if "contentBlockDelta" in chunk:
+                delta = chunk["contentBlockDelta"]["delta"]
+                if delta.get("text"):
+                    if not first_token:
+                        first_token = True
+                        if not replayed:
+                            metrics.BEDROCK_TTFT.observe(time.perf_counter() - started_at, call=label)
+                    yield delta["text"]
+            elif "metadata" in chunk:
+                usage = chunk["metadata"].get("usage")
+                if usage and not replayed:
+                    prompt_cache_stats['calls'] += 1
+                    prompt_cache_stats['input_tokens'] += usage.get('inputTokens', 0)
+                    prompt_cache_stats['cache_read_tokens'] += usage.get('cacheReadInputTokens', 0)
+                    prompt_cache_stats['cache_write_tokens'] += usage.get('cacheWriteInputTokens', 0)
+                    for kind, field in TOKEN_USAGE_FIELDS:
+                        metrics.BEDROCK_TOKENS.inc(usage.get(field, 0), call=label, kind=kind)
+    except GeneratorExit:
+        if hasattr(stream, 'close'):
+            stream.close()
+        print(f"✂️ {label}: stopped reading the response early")
+        raise
+    finally:
+        elapsed = time.perf_counter() - started_at
+        if replayed:
+            metrics.LLM_CACHE_REPLAYS.inc(call=label)
+            metrics.record(f"llm_cache_{label.replace(' ', '_')}", elapsed)
+        else:
+            metrics.BEDROCK_SECONDS.observe(elapsed, call=label)
+            metrics.record(f"bedrock_{label.replace(' ', '_')}", elapsed)
+        if estimated_tokens is not None and not replayed:
+            prompt_encoding.log_token_usage(label, estimated_tokens, usage)
+
+def extract_sections_with_llm(client, rows_df, specific_courses,
+                              catalog_token_budget=prompt_encoding.PROMPT_CATALOG_TOKEN_BUDGET, fresh=False):
+    """
+    Fallback for step 1: ask Claude to extract sections from catalog rows.
+
+    Only used for rows meeting_patterns cannot parse, and only when the
+    caller opts in with llm_fallback=True. Rows are sent in the compact
+    prompt_encoding table, as many as fit the token budget.
+
+    Returns:
+        List of {"class number", "course section", "teacher", "time"} dicts
+    """
+    table, included, omitted = prompt_encoding.encode_catalog(rows_df, budget=catalog_token_budget)
+    if omitted:
+        print(f"⚠️ Only {included} of {included + omitted} sections fit the step 1 prompt budget")
     summary = f"""
 COURSE DATA SUMMARY:
-- Total matching sections: {len(filtered_df)}
-- Columns: {', '.join(filtered_df.columns.tolist())}
+- Total matching sections: {len(rows_df)}
+- One section per line, "|"-separated; I/L/D ids refer to the lists above the header
 
-Sample of matching data:
-{filtered_df.head(20).to_string(index=False)}
+{table}
 """
     
-    # Clean up downloaded file
-    os.remove(local_file)
-    
-    # Setup Bedrock client
-    client = boto3.client(
-        service_name="bedrock-runtime",
-        aws_access_key_id=access_key_id,
-        aws_secret_access_key=secret_access_key,
-        region_name="us-east-1",
-    )
-    model_id = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
-    
-    # Step 1: Get course sections
     prompt1 = f"""
 You are an expert academic advisor. Extract course sections and professor information from the data.
 
@@ -216,128 +224,330 @@ The "class number" indicates what class it is. All course sections of the same c
 Respond with JSON ONLY - NO OTHER TEXT.
 """
     
-    response1 = client.converse_stream(
-        modelId=model_id,
+    response1 = converse_stream(
+        client,
+        fresh=fresh,
+        modelId=MODEL_ID,
         messages=[{"role": "user", "content": [{"text": prompt1}]}],
         inferenceConfig={"maxTokens": 1467, "temperature": 0.9},
     )
     
-    claude_output1 = ""
-    for chunk in response1["stream"]:
-        if "contentBlockDelta" in chunk:
-            delta = chunk["contentBlockDelta"]["delta"]
-            if delta.get("text"):
-                claude_output1 += delta["text"]
-    
-    all_sections = extract_json_from_response(claude_output1)
+    # Parse while streaming; a response cut off by maxTokens still yields
+    # every complete section plus whatever of the last one can be repaired
+    parser = json_stream.JsonArrayStreamParser()
+    sections = []
+    for text in iter_stream_text(response1, "step 1", prompt_encoding.estimate_tokens(prompt1)):
+        sections.extend(parser.feed(text))
+    sections.extend(parser.close())
+    return [entry for entry in sections if isinstance(entry, dict)]
+
+def _analysis_item(item, position, num_options):
+    """Option index (0-based) for a well-formed analysis item, else None."""
+    if not isinstance(item, dict):
+        return None
+    index = item.get('option', position + 1)
+    if not isinstance(index, int) or not 1 <= index <= num_options:
+        return None
+    if not isinstance(item.get('pros', []), list) or not isinstance(item.get('cons', []), list):
+        return None
+    return index - 1
+
+def iter_schedule_analysis(client, combos, prof_by_teacher, teacher_preference,
+                           professor_token_budget=professor_digest.PROMPT_PROFESSOR_TOKEN_BUDGET, fresh=False):
+    """
+    Ask Claude for pros and cons of schedules found by schedule_solver.
+
+    Each professor appears once, as a compact digest (see professor_digest),
+    and sections refer to it by id, so the prompt does not grow with
+    repeated instructors.
+
+    Items are parsed from the stream as they complete and yielded right
+    away. Once every option has one, the rest of the stream is read without
+    parsing (so its usage metadata is recorded), unless Claude keeps
+    writing past TRAILING_TEXT_LIMIT characters, in which case it is closed.
+
+    Args:
+        client: Bedrock runtime client
+        combos: List of tuples of meeting_patterns.SectionRecord
+        prof_by_teacher: Dict of teacher name -> RateMyProfessor data
+        teacher_preference: Description of what the student wants in a teacher
+        professor_token_budget: Approximate token budget for all digests
+        fresh: Bypass the LLM response cache
+
+    Yields:
+        (option index, {"option", "pros", "cons"}) pairs, at most one per option
+    """
+    professor_refs = {}
+    digests = {}
+    for combo in combos:
+        for section in combo:
+            info = prof_by_teacher.get(section.teacher)
+            if info and section.teacher not in professor_refs:
+                ref = f"P{len(professor_refs) + 1}"
+                professor_refs[section.teacher] = ref
+                digests[ref] = info.get('digest') or professor_digest.build_digest(info)
+    digests = professor_digest.fit_digests(digests, professor_token_budget)
     
-    # Get professor info from RateMyProfessor
-    teacher_jsons = []
-    for section in all_sections:
-        teacher_name = section['teacher']
-        name_parts = split_name(teacher_name)
-        if name_parts:
-            first_name, last_name = name_parts
-            teacher_info = ratemyprof_info.professorRater(first_name, last_name)
-            teacher_jsons.append(teacher_info)
-        else:
-            teacher_jsons.append(None)
+    # One "|"-separated line per section instead of a JSON object per section
+    option_lines = []
+    for i, combo in enumerate(combos):
+        option_lines.append(f"Option {i + 1}:")
+        for section in combo:
+            option_lines.append("|".join([
+                section.course_section,
+                section.teacher or '',
+                professor_refs.get(section.teacher, '-'),
+                section.to_prompt_dict()['time'],
+                section.location or '',
+                section.status or '',
+            ]))
+    options_text = "\n".join(option_lines)
     
-    # Step 2: Generate schedules with dates/times
-    schedule_prompt = f"""
-You are an academic advisor creating course schedules.
-
-STUDENT'S TEACHER PREFERENCES: "{teacher_preference}"
+    # Everything up to the preference depends only on the course set, so
+    # students asking for the same courses share a cached prompt prefix
+    static_prompt = f"""
+You are an academic advisor reviewing course schedules for a student.
 
-AVAILABLE COURSE SECTIONS AND PROFESSORS:
-{json.dumps([
-    {
-        'course_section': section.get('course section', ''),
-        'teacher': section.get('teacher', ''),
-        'time': section.get('time', ''),
-        'class_number': section.get('class number', ''),
-        'prof_info': teacher_jsons[i] if teacher_jsons[i] else None
-    }
-    for i, section in enumerate(all_sections)
-], indent=2)}
+PROFESSORS (RateMyProfessor ratings, tag counts and representative reviews; referenced by id below):
+{json.dumps(digests, separators=(',', ':'), ensure_ascii=False)}
 
-ORIGINAL DATA WITH DATES AND TIMES:
-{filtered_df[['Course Section', 'Meeting Patterns', 'Locations', 'Start Date', 'End Date']].to_string(index=False)}
+SCHEDULE OPTIONS (already conflict-free; professor refers to the list above, "-" if unrated):
+course_section|teacher|professor|time|location|status
+{options_text}
 
 TASK:
-Create {num_schedules} different course schedules. For each schedule, also provide pros and cons.
-
-CRITICAL REQUIREMENTS:
-- NO OVERLAPPING TIMES: Within each schedule, classes MUST be scheduled at different times
-- Each course can only have ONE section per schedule (no duplicates)
-- Classes cannot overlap if they share any common days (e.g., both Monday+Wednesday)
-
-For each schedule:
-1. For each course (by class_number), pick ONE section with the best professor matching the preferences
-2. Ensure NO two classes overlap in time (check days_of_week and start/end times)
-3. Use Start Date for the first class meeting
-4. Parse Meeting Patterns to get days and times
-5. Use End Date for the semester end
-6. Provide brief pros and cons based on professor quality, schedule convenience, time preferences
-
-OUTPUT FORMAT (JSON array with schedule and analysis):
+For each schedule option, provide brief pros and cons based on professor quality,
+how well the professors match the student's preferences, and schedule convenience
+(time of day, days on campus, gaps between classes).
+
+OUTPUT FORMAT (JSON array, one item per option, same order):
 [
-  {{
-    "schedule": [
-      {{"summary": "MATH 51-3", "location": "Daly Science 300", "description": "Schaeffer", "start": "2025-09-22T13:00:00", "end": "2025-09-22T14:05:00", "days_of_week": ["MO","WE","FR"], "end_sem": "2025-12-12"}},
-      {{"summary": "PHYS 32-2", "location": "SCDI 1308", "description": "Williams", "start": "2025-09-23T08:00:00", "end": "2025-09-23T09:05:00", "days_of_week": ["MO","WE","FR"], "end_sem": "2025-12-12"}}
-    ],
-    "pros": ["High-rated professors", "Morning classes", "No Friday classes"],
-    "cons": ["Early start time", "Classes on MWF only"]
-  }}
+  {{"option": 1, "pros": ["High-rated professors", "No Friday classes"], "cons": ["Early start time"]}}
 ]
 
 OUTPUT ONLY THE JSON ARRAY - NO OTHER TEXT.
 """
+    preference_prompt = f"""
+STUDENT'S TEACHER PREFERENCES: "{teacher_preference}"
+"""
+    content = [{"text": static_prompt}]
+    if PROMPT_CACHE:
+        content.append({"cachePoint": {"type": "default"}})
+    content.append({"text": preference_prompt})
+    schedule_prompt = static_prompt + preference_prompt
     
-    response2 = client.converse_stream(
-        modelId=model_id,
-        messages=[{"role": "user", "content": [{"text": schedule_prompt}]}],
+    response2 = converse_stream(
+        client,
+        fresh=fresh,
+        modelId=MODEL_ID,
+        messages=[{"role": "user", "content": content}],
         inferenceConfig={"maxTokens": 2000, "temperature": 0.5},
     )
     
-    schedule_output = ""
-    for chunk in response2["stream"]:
-        if "contentBlockDelta" in chunk:
-            delta = chunk["contentBlockDelta"]["delta"]
-            if delta.get("text"):
-                schedule_output += delta["text"]
+    parser = json_stream.JsonArrayStreamParser()
+    seen = set()
+    position = 0
+    deltas = iter_stream_text(response2, "step 2", prompt_encoding.estimate_tokens(schedule_prompt))
+    trailing = 0
+    try:
+        for text in deltas:
+            if len(seen) == len(combos):
+                # Everything we asked for has arrived. Normally only "]" is
+                # left; reading on to the metadata event gets token usage
+                # (and prompt cache hits) counted. Runaway output is cut off.
+                trailing += len(text)
+                if trailing > TRAILING_TEXT_LIMIT:
+                    llm_cache.mark_complete(response2)
+                    break
+                continue
+            for item in parser.feed(text):
+                index = _analysis_item(item, position, len(combos))
+                position += 1
+                if index is not None and index not in seen:
+                    seen.add(index)
+                    yield index, item
+    finally:
+        deltas.close()
     
-    json_str = schedule_output[schedule_output.find("["):schedule_output.rfind("]")+1] 
-    schedules_with_analysis = json.loads(json_str)
+    # A truncated final item (maxTokens) is repaired rather than lost
+    for item in parser.close():
+        index = _analysis_item(item, position, len(combos))
+        if index is not None and index not in seen:
+            seen.add(index)
+            yield index, item
+
+def analyze_schedules_with_llm(client, combos, prof_by_teacher, teacher_preference,
+                               professor_token_budget=professor_digest.PROMPT_PROFESSOR_TOKEN_BUDGET, fresh=False):
+    """
+    List form of iter_schedule_analysis.
+
+    Returns:
+        List of {"option", "pros", "cons"} dicts
+    """
+    return [item for _, item in iter_schedule_analysis(
+        client, combos, prof_by_teacher, teacher_preference, professor_token_budget, fresh)]
+
+def iter_schedule_events(specific_courses: str, teacher_preference: str, num_schedules: int = 3,
+                         llm_fallback: bool = LLM_SECTION_FALLBACK, fresh: bool = False):
+    """
+    Run the schedule pipeline, yielding progress as it goes.
+
+    Schedules are yielded as soon as the solver has validated them, before
+    Claude has written their pros and cons; the analysis follows in
+    separate events.
+
+    Args:
+        Same as generate_schedules
+
+    Yields:
+        Event dicts, each with an "event" key:
+            {"event": "stage", "stage": name, "message": text}
+            {"event": "schedule", "index": i, "option": {"schedule", "pros", "cons"}}
+            {"event": "analysis", "index": i, "pros": [...], "cons": [...]}
+            {"event": "done", "count": number of schedules}
+
+    Raises:
+        CourseNotFoundError, NoValidScheduleError: as generate_schedules
+    """
+    # Load catalog (cached in-process, revalidated against S3 by ETag)
+    yield {'event': 'stage', 'stage': 'catalog', 'message': 'Loading course catalog'}
+    with metrics.stage('catalog'):
+        df, section_index = catalog.get_indexed_catalog()
     
-    # Parse schedules with pros/cons
-    total_schedules = []
-    for item in schedules_with_analysis:
-        if isinstance(item, dict) and 'schedule' in item:
-            total_schedules.append({
-                'schedule': item['schedule'],
+    # Filter for specified courses via the section index; raises
+    # CourseNotFoundError if none of them exist in the catalog
+    course_keywords = [c.strip() for c in (specific_courses or '').split(',') if c.strip()]
+    if course_keywords:
+        with metrics.stage('filter'):
+            filtered_df, unmatched = section_index.select(df, course_keywords)
+        if unmatched:
+            print(f"⚠️ No matching sections found for: {unmatched}")
+    else:
+        filtered_df = df
+    
+    # Step 1: Parse course sections locally from the catalog columns
+    yield {'event': 'stage', 'stage': 'sections', 'message': f'Reading {len(filtered_df)} sections'}
+    with metrics.stage('parse_sections'):
+        sections, unparsed_rows = meeting_patterns.parse_sections(
+            filtered_df.to_dict('records'), course_keywords
+        )
+    
+    # Setup Bedrock client
+    client = boto3.client(
+        service_name="bedrock-runtime",
+        aws_access_key_id=access_key_id,
+        aws_secret_access_key=secret_access_key,
+        region_name="us-east-1",
+    )
+    
+    all_sections = [section.to_prompt_dict() for section in sections]
+    if unparsed_rows:
+        if llm_fallback:
+            print(f"⚠️ Asking Claude to extract {len(unparsed_rows)} sections the parser could not read")
+            class_numbers = {section.course: section.class_number for section in sections}
+            for entry in extract_sections_with_llm(client, pd.DataFrame(unparsed_rows), specific_courses,
+                                                   fresh=fresh) or []:
+                record = meeting_patterns.section_from_prompt_dict(entry, class_numbers)
+                if record:
+                    sections.append(record)
+                    all_sections.append(record.to_prompt_dict())
+                else:
+                    all_sections.append(entry)
+        else:
+            print(f"⚠️ Skipping {len(unparsed_rows)} sections with unrecognized meeting patterns")
+    
+    # Get professor info from RateMyProfessor: cached, once per distinct
+    # teacher, batched into aliased GraphQL requests; results map back to
+    # sections in order
+    yield {'event': 'stage', 'stage': 'professors', 'message': 'Looking up professor ratings'}
+    name_parts = [split_name(section['teacher'] or '') for section in all_sections]
+    with metrics.stage('professors'):
+        professor_results = ratemyprof_info.rate_professors([parts for parts in name_parts if parts])
+    teacher_jsons = [professor_results.get(parts) if parts else None for parts in name_parts]
+    
+    # Professor data by teacher name, used for ranking and for the analysis prompt
+    prof_by_teacher = {}
+    for section, info in zip(all_sections, teacher_jsons):
+        if info:
+            prof_by_teacher[section['teacher']] = info
+    ratings = {
+        teacher: info['professor_info'].get('avgRating')
+        for teacher, info in prof_by_teacher.items()
+    }
+    
+    # Step 2: Enumerate conflict-free schedules locally
+    yield {'event': 'stage', 'stage': 'solve', 'message': 'Building conflict-free schedules'}
+    with metrics.stage('solve'):
+        combos = schedule_solver.solve_schedules(sections, num_schedules, ratings)
+    for i, combo in enumerate(combos):
+        yield {
+            'event': 'schedule',
+            'index': i,
+            'option': {'schedule': schedule_solver.schedule_entries(combo), 'pros': [], 'cons': []}
+        }
+    
+    # Step 3: Ask Claude only for pros and cons of each schedule
+    # (each option's pros and cons are passed on as soon as they are parsed)
+    yield {'event': 'stage', 'stage': 'analysis', 'message': 'Reviewing schedules'}
+    try:
+        for index, item in iter_schedule_analysis(client, combos, prof_by_teacher, teacher_preference,
+                                                  fresh=fresh):
+            yield {
+                'event': 'analysis',
+                'index': index,
                 'pros': item.get('pros', []),
                 'cons': item.get('cons', [])
-            })
-        else:
-            total_schedules.append({
-                'schedule': item,
-                'pros': [],
-                'cons': []
-            })
+            }
+    except Exception as e:
+        print(f"⚠️ Schedule analysis failed, returning schedules without pros/cons: {e}")
     
-    # Filter out schedules with overlapping times
-    valid_schedules = filter_valid_schedules(total_schedules)
+    yield {'event': 'done', 'count': len(combos)}
+
+def generate_schedules(specific_courses: str, teacher_preference: str, num_schedules: int = 3,
+                       llm_fallback: bool = LLM_SECTION_FALLBACK, fresh: bool = False):
+    """
+    Generate course schedules using RateMyProfessor data and Claude AI.
     
-    # If we lost some schedules due to overlaps, log it
-    if len(valid_schedules) < len(total_schedules):
-        print(f"⚠️ Filtered out {len(total_schedules) - len(valid_schedules)} schedules with overlapping times")
+    Sections are parsed and combined into conflict-free schedules locally;
+    Claude only writes the pros and cons for each option. This collects
+    the events of iter_schedule_events into the final list.
     
-    # If no valid schedules remain, return the original (better than nothing)
-    if not valid_schedules:
-        print("⚠️ No schedules passed overlap check, returning all schedules")
-        return total_schedules
+    Args:
+        specific_courses: Comma-separated course names (e.g., "MATH 51, PHYS 32")
+        teacher_preference: Description of what user wants in a teacher
+        num_schedules: Number of schedule options to generate
+        llm_fallback: Ask Claude to extract sections whose meeting patterns
+            the local parser cannot read (otherwise they are skipped)
+        fresh: Bypass the LLM response cache and ask Claude again
+        
+    Returns:
+        List of schedule options with pros/cons
+    """
+    return collect_schedules(
+        iter_schedule_events(specific_courses, teacher_preference, num_schedules, llm_fallback, fresh)
+    )
+
+def collect_schedules(events):
+    """Fold iter_schedule_events events into the list generate_schedules returns."""
+    total_schedules = []
+    for event in events:
+        if event['event'] == 'schedule':
+            total_schedules.append(event['option'])
+        elif event['event'] == 'analysis':
+            total_schedules[event['index']]['pros'] = event['pros']
+            total_schedules[event['index']]['cons'] = event['cons']
     
-    return valid_schedules
+    return total_schedules
 
+def schedule_events_from_result(schedules):
+    """The events iter_schedule_events would yield for a finished result."""
+    for i, option in enumerate(schedules):
+        yield {
+            'event': 'schedule',
+            'index': i,
+            'option': {'schedule': option['schedule'], 'pros': [], 'cons': []}
+        }
+    for i, option in enumerate(schedules):
+        if option.get('pros') or option.get('cons'):
+            yield {'event': 'analysis', 'index': i, 'pros': option['pros'], 'cons': option['cons']}
+    yield {'event': 'done', 'count': len(schedules)}
@@ -0,0 +1,97 @@
+import re
+
+# "MATH 51-2", "MATH 51-2 - Calculus II", "CSEN 12L-31", "math51"
+COURSE_KEY_PATTERN = re.compile(
+    r"^\s*([A-Za-z]{2,6})\s*(\d+[A-Za-z]*)\s*(?:-\s*([A-Za-z0-9]+))?"
+)
+
+class CourseNotFoundError(ValueError):
+    """None of the requested courses exist in the catalog."""
+
+    def __init__(self, courses):
+        self.courses = list(courses)
+        super().__init__(f"No sections found for: {', '.join(self.courses)}")
+
+def parse_course_key(text):
+    """
+    Split a course or section label into its key parts.
+
+    Args:
+        text: e.g. "MATH 51", "math51" or "MATH 51-2 - Calculus II"
+
+    Returns:
+        (subject, catalog number, section or None), upper-cased, or None if
+        the text does not look like a course
+    """
+    if not isinstance(text, str):
+        return None
+    match = COURSE_KEY_PATTERN.match(text)
+    if not match:
+        return None
+    subject, number, section = match.groups()
+    return subject.upper(), number.upper(), section.upper() if section else None
+
+class SectionIndex:
+    """
+    Hash index over the "Course Section" column.
+
+    Courses are keyed by (subject, catalog number) and sections by
+    (subject, catalog number, section), so "MATH 5" never matches "MATH 51-1".
+    Values are row positions in the indexed DataFrame.
+    """
+
+    def __init__(self, course_sections):
+        self._by_course = {}
+        self._by_section = {}
+        for pos, label in enumerate(course_sections):
+            key = parse_course_key(label)
+            if not key or not key[2]:
+                continue
+            subject, number, section = key
+            self._by_course.setdefault((subject, number), []).append(pos)
+            self._by_section.setdefault((subject, number, section), []).append(pos)
+
+    @classmethod
+    def from_dataframe(cls, df, column="Course Section"):
+        return cls(df[column].tolist() if column in df.columns else [])
+
+    def __len__(self):
+        return len(self._by_section)
+
+    def lookup(self, query):
+        """Row positions for a course ("MATH 51") or one section ("MATH 51-2")."""
+        key = parse_course_key(query)
+        if not key:
+            return []
+        subject, number, section = key
+        if section:
+            return list(self._by_section.get((subject, number, section), []))
+        return list(self._by_course.get((subject, number), []))
+
+    def select(self, df, courses):
+        """
+        Rows of `df` for the requested courses, in catalog order.
+
+        Fallback behaviour: courses without a match are skipped and returned
+        in `unmatched` so the caller can report them. If nothing matches at
+        all, CourseNotFoundError is raised rather than falling back to the
+        whole catalog.
+
+        Args:
+            df: The DataFrame this index was built from
+            courses: Iterable of course or section labels
+
+        Returns:
+            (filtered DataFrame, list of unmatched course labels)
+        """
+        positions = set()
+        unmatched = []
+        for course in courses:
+            hits = self.lookup(course)
+            if hits:
+                positions.update(hits)
+            else:
+                unmatched.append(course)
+        if not positions:
+            raise CourseNotFoundError(unmatched)
+        return df.iloc[sorted(positions)], unmatched
@@ -1,17 +1,37 @@
-import csv
-from datetime import datetime
+import hashlib
+import json
+from collections import Counter
 import pytz
 import os.path
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+import random
+import threading
 import time
+from calendar_entries import ScheduleEntry, entries_from_csv, term_of
+import metrics
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 TIMEZONE = 'America/Los_Angeles'
 
-def get_service():
+# Requests per batch HTTP call (Google recommends at most 50)
+BATCH_SIZE = 50
+MAX_RETRIES = int(os.getenv("GCAL_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("GCAL_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("GCAL_BACKOFF_MAX", "32"))
+
+# Credentials, per-thread services and calendar ids are kept for the life
+# of the process (httplib2, used by the API client, is not thread-safe)
+_creds = None
+_creds_lock = threading.Lock()
+_local = threading.local()
+_calendar_ids = {}
+_calendar_lock = threading.Lock()
+
+def _load_credentials():
     creds = None
     # Get the directory where gcal.py is located
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -52,70 +72,383 @@ def get_service():
             creds = flow.run_local_server(port=0)
         with open(token_file, 'w') as token:
             token.write(creds.to_json())
-    return build('calendar', 'v3', credentials=creds)
-
-def get_or_create_calendar(name="Class Schedule", timezone=TIMEZONE):
-    service = get_service()
-    calendar_list = service.calendarList().list().execute()
-    for cal in calendar_list.get('items', []):
-        if cal['summary'] == name:
-            print(f"✅ Found existing calendar: {name}")
-            return cal['id']
-    calendar = {'summary': name, 'timeZone': timezone}
-    created_calendar = service.calendars().insert(body=calendar).execute()
-    print(f"✅ Created new calendar: {name}")
-    return created_calendar['id']
-
-def add_events_from_csv(calendar_id, filename):
-    service = get_service()
+    return creds
+
+def _save_token(creds):
+    token_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'token.json')
+    with open(token_file, 'w') as token:
+        token.write(creds.to_json())
+
+def get_credentials():
+    """
+    Process-wide OAuth credentials, loaded from token.json once and
+    refreshed under a lock so concurrent requests refresh only once.
+    """
+    global _creds
+    with _creds_lock:
+        if _creds is None or not _creds.valid:
+            if _creds is not None and _creds.expired and _creds.refresh_token:
+                _creds.refresh(Request())
+                _save_token(_creds)
+            else:
+                _creds = _load_credentials()
+        return _creds
+
+def get_service():
+    """
+    Calendar API service for the calling thread.
+
+    Built once per thread from the bundled discovery document (no discovery
+    request, no on-disk discovery cache) and rebuilt only when the
+    credentials object changes.
+    """
+    creds = get_credentials()
+    service = getattr(_local, 'service', None)
+    if service is None or _local.creds is not creds:
+        service = build('calendar', 'v3', credentials=creds, cache_discovery=False, static_discovery=True)
+        _local.service = service
+        _local.creds = creds
+    return service
+
+def get_or_create_calendar(name="Class Schedule", timezone=TIMEZONE, service=None, refresh=False):
+    """
+    Id of the calendar called name, creating it if needed.
+
+    Ids are remembered per name, so only the first call scans
+    calendarList; pass refresh=True (or call forget_calendar) if the
+    calendar may have been deleted.
+    """
+    with _calendar_lock:
+        if not refresh and name in _calendar_ids:
+            return _calendar_ids[name]
+        service = service or get_service()
+        calendar_list = execute_timed('calendar_list', service.calendarList().list())
+        for cal in calendar_list.get('items', []):
+            if cal['summary'] == name:
+                print(f"✅ Found existing calendar: {name}")
+                _calendar_ids[name] = cal['id']
+                return cal['id']
+        calendar = {'summary': name, 'timeZone': timezone}
+        created_calendar = execute_timed('calendar_insert', service.calendars().insert(body=calendar))
+        print(f"✅ Created new calendar: {name}")
+        _calendar_ids[name] = created_calendar['id']
+        return created_calendar['id']
+
+def forget_calendar(name):
+    with _calendar_lock:
+        _calendar_ids.pop(name, None)
+
+def is_missing_calendar(error):
+    """True if an API error means the calendar no longer exists."""
+    return isinstance(error, HttpError) and error.resp.status in (404, 410)
+
+def is_rate_limited(error):
+    """True for the 429 / 403 rateLimitExceeded responses Google asks clients to retry."""
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    if status == 429:
+        return True
+    content = error.content.decode('utf-8', 'replace') if isinstance(error.content, bytes) else str(error.content)
+    return status == 403 and 'ratelimitexceeded' in content.lower()
+
+def _backoff_delay(attempt, error=None):
+    retry_after = error.resp.get('retry-after') if isinstance(error, HttpError) else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def _observe(operation, seconds):
+    metrics.GCAL_SECONDS.observe(seconds, operation=operation)
+    metrics.record(f"gcal_{operation}", seconds)
+
+def execute_timed(operation, request):
+    """request.execute(), recorded in the gcal_* metrics under operation."""
+    start = time.perf_counter()
+    try:
+        response = request.execute()
+    except Exception:
+        metrics.GCAL_REQUESTS.inc(operation=operation, outcome='error')
+        raise
+    finally:
+        _observe(operation, time.perf_counter() - start)
+    metrics.GCAL_REQUESTS.inc(operation=operation, outcome='ok')
+    return response
+
+def execute_batch(service, requests):
+    """
+    Execute API requests in batch HTTP calls, retrying rate-limited ones.
+
+    Args:
+        service: Calendar API service
+        requests: List of HttpRequest objects (e.g. events().insert(...))
+
+    Returns:
+        (responses, errors): lists the same length as requests; each slot
+        holds the response or the final exception, the other one None
+    """
+    responses = [None] * len(requests)
+    errors = [None] * len(requests)
+    pending = list(range(len(requests)))
+
+    for attempt in range(MAX_RETRIES + 1):
+        retry = []
+
+        def callback(request_id, response, exception):
+            i = int(request_id)
+            outcome = 'ok'
+            if exception is None:
+                responses[i] = response
+                errors[i] = None
+            else:
+                errors[i] = exception
+                outcome = 'error'
+                if is_rate_limited(exception):
+                    retry.append(i)
+                    outcome = 'rate_limited'
+            metrics.GCAL_REQUESTS.inc(operation='batch_item', outcome=outcome)
+
+        for offset in range(0, len(pending), BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=callback)
+            for i in pending[offset:offset + BATCH_SIZE]:
+                batch.add(requests[i], request_id=str(i))
+            start = time.perf_counter()
+            try:
+                batch.execute()
+            finally:
+                _observe('batch', time.perf_counter() - start)
+
+        if not retry or attempt == MAX_RETRIES:
+            break
+        delay = _backoff_delay(attempt, errors[retry[0]])
+        print(f"⏳ Google Calendar rate limit on {len(retry)} requests, retrying in {delay:.1f}s")
+        time.sleep(delay)
+        pending = sorted(retry)
+
+    return responses, errors
+
+def event_from_entry(entry):
+    """
+    Calendar event body for a calendar_entries.ScheduleEntry.
+
+    Returns:
+        Event dict, or None for TBA/online sections without a meeting time
+    """
+    if not entry.is_timed:
+        return None
     tz = pytz.timezone(TIMEZONE)
-    schedule = []
-
-    with open(filename, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            start_time = tz.localize(datetime.fromisoformat(row['start']))
-            end_time = tz.localize(datetime.fromisoformat(row['end']))
-
-            event = {
-                'summary': row['summary'],
-                'location': row['location'],
-                'description': row['description'],
-                'start': {'dateTime': start_time.isoformat(), 'timeZone': TIMEZONE},
-                'end': {'dateTime': end_time.isoformat(), 'timeZone': TIMEZONE}
-            }
-
-            # Add recurrence if days_of_week and end_sem are provided
-            if row.get('days_of_week') and row.get('end_sem'):
-                days = row['days_of_week'].split(',')
-                until_date = datetime.fromisoformat(row['end_sem']).strftime('%Y%m%dT235959Z')
-                rrule = f"RRULE:FREQ=WEEKLY;BYDAY={','.join(days)};UNTIL={until_date}"
-                event['recurrence'] = [rrule]
-
-            created = service.events().insert(calendarId=calendar_id, body=event).execute()
-            time.sleep(1)
-            event_id = created['id']
-            retrieved = service.events().get(calendarId=calendar_id, eventId=event_id).execute()
-
-            schedule.append({
-                'summary': retrieved['summary'],
-                'location': retrieved.get('location', ''),
-                'description': retrieved.get('description', ''),
-                'start': retrieved['start']['dateTime'],
-                'end': retrieved['end']['dateTime'],
-                'recurrence': retrieved.get('recurrence', [])
-            })
-
-    # Print human-readable schedule
+    start_time = tz.localize(entry.start)
+    end_time = tz.localize(entry.end)
+
+    event = {
+        'summary': entry.summary,
+        'location': entry.location,
+        'description': entry.description,
+        'start': {'dateTime': start_time.isoformat(), 'timeZone': TIMEZONE},
+        'end': {'dateTime': end_time.isoformat(), 'timeZone': TIMEZONE}
+    }
+
+    # Add recurrence if days_of_week and end_sem are provided
+    rrule = entry.rrule()
+    if rrule:
+        event['recurrence'] = [rrule]
+    return event
+
+def event_from_row(row):
+    """event_from_entry for a schedule entry dict / CSV row."""
+    return event_from_entry(ScheduleEntry.from_dict(row))
+
+def insert_events(calendar_id, events, service=None):
+    """
+    Insert events in batch HTTP requests.
+
+    Args:
+        calendar_id: Target calendar
+        events: List of event bodies
+        service: Calendar API service (a new one if omitted)
+
+    Returns:
+        List of created events, as returned by the insert calls
+
+    Raises:
+        The first insert error, after the other events have been added
+    """
+    service = service or get_service()
+    requests = [service.events().insert(calendarId=calendar_id, body=event) for event in events]
+    created, errors = execute_batch(service, requests)
+    failed = [(event, error) for event, error in zip(events, errors) if error is not None]
+    for event, error in failed:
+        print(f"⚠️ Could not add {event['summary']}: {error}")
+    if failed:
+        raise failed[0][1]
+    return created
+
+def print_schedule(created):
+    """Print a human-readable schedule from created events."""
     print("\n📅 Your Class Schedule:\n")
-    for evt in schedule:
-        rec_str = f" (Recurring: {evt['recurrence'][0]})" if evt['recurrence'] else ""
-        print(f"{evt['summary']} | {evt['start']} - {evt['end']} | {evt['location']}{rec_str}")
-        if evt['description']:
-            print(f"  Description: {evt['description']}")
+    for retrieved in created:
+        recurrence = retrieved.get('recurrence', [])
+        rec_str = f" (Recurring: {recurrence[0]})" if recurrence else ""
+        print(f"{retrieved['summary']} | {retrieved['start']['dateTime']} - {retrieved['end']['dateTime']} | "
+              f"{retrieved.get('location', '')}{rec_str}")
+        if retrieved.get('description'):
+            print(f"  Description: {retrieved['description']}")
         print("---------------------------------------------------")
 
+def add_entries(calendar_id, entries, service=None, term=None):
+    """
+    Add schedule entries to a calendar (TBA entries are skipped).
+
+    The events carry the same sync tags sync_entries would give them, so
+    a later sync for the term updates them instead of adding copies.
+
+    Args:
+        calendar_id: Target calendar
+        entries: List of calendar_entries.ScheduleEntry
+        service: Calendar API service (the cached one if omitted)
+        term: Sync scope (defaults to calendar_entries.term_of(entries))
+
+    Returns:
+        List of created events
+    """
+    events = [event for event in map(event_from_entry, entries) if event]
+    tag_events(events, term or term_of(entries))
+
+    # One batch round trip; insert responses already hold the created events
+    created = insert_events(calendar_id, events, service)
+    print_schedule(created)
+    return created
+
+def add_events_from_csv(calendar_id, filename, service=None):
+    return add_entries(calendar_id, entries_from_csv(filename), service)
+
+# Private extended properties that mark events managed by sync_events
+SYNC_TERM_PROPERTY = 'scheduleTerm'
+SYNC_KEY_PROPERTY = 'scheduleKey'
+SYNC_HASH_PROPERTY = 'scheduleHash'
+SYNCED_FIELDS = ('summary', 'location', 'description', 'start', 'end', 'recurrence')
+
+def event_hash(event):
+    """Hash of the fields sync_events compares."""
+    content = {field: event.get(field) for field in SYNCED_FIELDS}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()[:16]
+
+def tag_events(events, term):
+    """
+    Add sync tags to event bodies, in place.
+
+    The key is the term plus the course section (the summary) and, for
+    sections with several meeting patterns, the pattern's position.
+    """
+    seen = Counter()
+    for event in events:
+        n = seen[event['summary']]
+        seen[event['summary']] += 1
+        event['extendedProperties'] = {'private': {
+            SYNC_TERM_PROPERTY: term,
+            SYNC_KEY_PROPERTY: f"{term}|{event['summary']}|{n}",
+            SYNC_HASH_PROPERTY: event_hash(event),
+        }}
+    return events
+
+def list_synced_events(calendar_id, term, service=None):
+    """Events in the calendar that sync_events created for term."""
+    service = service or get_service()
+    events = []
+    page_token = None
+    while True:
+        page = execute_timed('events_list', service.events().list(
+            calendarId=calendar_id,
+            privateExtendedProperty=f"{SYNC_TERM_PROPERTY}={term}",
+            maxResults=2500,
+            pageToken=page_token
+        ))
+        events.extend(page.get('items', []))
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            return events
+
+def sync_events(calendar_id, events, term, service=None):
+    """
+    Make the calendar's events for term match events, idempotently.
+
+    Existing events for the term are listed once and compared by sync key
+    and content hash; only the needed inserts, updates and deletes are
+    sent, together in one batch. Changed events are replaced whole
+    (events.update), so fields the new body drops, like a recurrence
+    rule, don't linger. Events not created by sync_events (or created for
+    another term) are left alone.
+
+    Args:
+        calendar_id: Target calendar
+        events: Event bodies (see event_from_row)
+        term: Sync scope, e.g. calendar_entries.term_of(entries)
+        service: Calendar API service (a new one if omitted)
+
+    Returns:
+        Dict with inserted/updated/deleted/unchanged counts
+    """
+    service = service or get_service()
+    desired = {e['extendedProperties']['private'][SYNC_KEY_PROPERTY]: e
+               for e in tag_events([dict(e) for e in events], term)}
+
+    existing = {}
+    duplicates = []
+    for event in list_synced_events(calendar_id, term, service):
+        key = event.get('extendedProperties', {}).get('private', {}).get(SYNC_KEY_PROPERTY)
+        if key in existing:
+            duplicates.append(event)
+        else:
+            existing[key] = event
+
+    requests = []
+    counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    for key, event in desired.items():
+        current = existing.pop(key, None)
+        if current is None:
+            requests.append(service.events().insert(calendarId=calendar_id, body=event))
+            counts['inserted'] += 1
+        elif current['extendedProperties']['private'].get(SYNC_HASH_PROPERTY) != \
+                event['extendedProperties']['private'][SYNC_HASH_PROPERTY]:
+            requests.append(service.events().update(calendarId=calendar_id, eventId=current['id'], body=event))
+            counts['updated'] += 1
+        else:
+            counts['unchanged'] += 1
+    for event in list(existing.values()) + duplicates:
+        requests.append(service.events().delete(calendarId=calendar_id, eventId=event['id']))
+        counts['deleted'] += 1
+
+    if requests:
+        _, errors = execute_batch(service, requests)
+        failed = [error for error in errors if error is not None]
+        if failed:
+            print(f"⚠️ {len(failed)} of {len(requests)} calendar changes failed")
+            raise failed[0]
+    print(f"🔄 Synced {term}: {counts}")
+    return counts
+
+def sync_entries(calendar_id, entries, term=None, service=None):
+    """
+    sync_events for schedule entries.
+
+    Args:
+        calendar_id: Target calendar
+        entries: List of calendar_entries.ScheduleEntry
+        term: Sync scope (defaults to calendar_entries.term_of(entries))
+        service: Calendar API service (the cached one if omitted)
+    """
+    events = [event for event in map(event_from_entry, entries) if event]
+    return sync_events(calendar_id, events, term or term_of(entries), service)
+
+def sync_events_from_csv(calendar_id, filename, term=None, service=None):
+    return sync_entries(calendar_id, entries_from_csv(filename), term, service)
+
 def run():
+    """Add the schedule.csv written by converse.py to the "Class Schedule" calendar."""
     calendar_id = get_or_create_calendar("Class Schedule")
     add_events_from_csv(calendar_id, 'schedule.csv')
 
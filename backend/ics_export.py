@@ -0,0 +1,125 @@
+import hashlib
+from collections import Counter
+from datetime import datetime, timezone
+
+from calendar_entries import parse_entries
+
+TIMEZONE = 'America/Los_Angeles'
+PRODID = '-//SCU Schedule Builder//EN'
+UID_DOMAIN = 'schedule-builder.local'
+
+# US Pacific rules (in effect since 2007), so the file needs no tz database
+VTIMEZONE = [
+    'BEGIN:VTIMEZONE',
+    f'TZID:{TIMEZONE}',
+    'BEGIN:DAYLIGHT',
+    'TZOFFSETFROM:-0800',
+    'TZOFFSETTO:-0700',
+    'TZNAME:PDT',
+    'DTSTART:19700308T020000',
+    'RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=2SU',
+    'END:DAYLIGHT',
+    'BEGIN:STANDARD',
+    'TZOFFSETFROM:-0700',
+    'TZOFFSETTO:-0800',
+    'TZNAME:PST',
+    'DTSTART:19701101T020000',
+    'RRULE:FREQ=YEARLY;BYMONTH=11;BYDAY=1SU',
+    'END:STANDARD',
+    'END:VTIMEZONE',
+]
+
+def escape_text(value):
+    """Escape a TEXT property value (RFC 5545 section 3.3.11)."""
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def fold(line):
+    """Fold a content line to 75 octets, continuation lines starting with a space."""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    start = 0
+    limit = 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Don't split a UTF-8 sequence
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode('utf-8'))
+        start = end
+        limit = 74  # the leading space counts
+    return '\r\n '.join(parts) + '\r\n'
+
+def _local(dt):
+    return dt.strftime('%Y%m%dT%H%M%S')
+
+def event_lines(entry, uid, stamp):
+    """VEVENT content lines for a timed calendar_entries.ScheduleEntry."""
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART;TZID={TIMEZONE}:{_local(entry.start)}',
+        f'DTEND;TZID={TIMEZONE}:{_local(entry.end)}',
+        f'SUMMARY:{escape_text(entry.summary)}',
+    ]
+    if entry.location:
+        lines.append(f'LOCATION:{escape_text(entry.location)}')
+    if entry.description:
+        lines.append(f'DESCRIPTION:{escape_text(entry.description)}')
+    # Same weekly rule gcal sends to Google Calendar
+    rrule = entry.rrule()
+    if rrule:
+        lines.append(rrule)
+    lines.append('END:VEVENT')
+    return lines
+
+def iter_ics(entries, calendar_name='Class Schedule', now=None):
+    """
+    Render schedule entries as an iCalendar (RFC 5545) file, in chunks.
+
+    TBA entries (no start/end) are skipped. UIDs are derived from the
+    course section and meeting time, so re-importing the same schedule
+    updates events instead of duplicating them.
+
+    Args:
+        entries: List of calendar_entries.ScheduleEntry
+        calendar_name: X-WR-CALNAME shown by calendar apps
+        now: DTSTAMP time (defaults to now, UTC)
+
+    Yields:
+        Folded CRLF-terminated text, one component at a time
+    """
+    stamp = (now or datetime.now(timezone.utc)).astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    header = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(calendar_name)}',
+        f'X-WR-TIMEZONE:{TIMEZONE}',
+    ] + VTIMEZONE
+    yield ''.join(fold(line) for line in header)
+
+    seen = Counter()
+    for entry in entries:
+        if not entry.is_timed:
+            continue
+        n = seen[entry.summary]
+        seen[entry.summary] += 1
+        key = f"{entry.summary}|{n}|{_local(entry.start)}"
+        uid = f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}@{UID_DOMAIN}"
+        yield ''.join(fold(line) for line in event_lines(entry, uid, stamp))
+
+    yield fold('END:VCALENDAR')
+
+def to_ics(entries, calendar_name='Class Schedule', now=None):
+    """iter_ics joined into one string."""
+    return ''.join(iter_ics(entries, calendar_name, now))
+
+def schedule_to_ics(schedule, calendar_name='Class Schedule', now=None):
+    """to_ics for entry dicts as produced by schedule_solver.schedule_entries."""
+    return to_ics(parse_entries(schedule), calendar_name, now)
@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from course_index import CourseNotFoundError
+from schedule_solver import NoValidScheduleError
+
+MAX_WORKERS = int(os.getenv("SCHEDULE_JOB_WORKERS", "4"))
+# Jobs allowed to wait for a worker before new ones are rejected
+MAX_QUEUED = int(os.getenv("SCHEDULE_JOB_QUEUE_DEPTH", "32"))
+JOB_TIMEOUT = float(os.getenv("SCHEDULE_JOB_TIMEOUT", "120"))
+# How long finished jobs stay pollable
+RESULT_TTL = float(os.getenv("SCHEDULE_JOB_RESULT_TTL", "600"))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMED_OUT = 'timed_out'
+FINISHED = {SUCCEEDED, FAILED, CANCELLED, TIMED_OUT}
+
+class QueueFullError(RuntimeError):
+    """Raised by JobQueue.submit when the queue is at its depth limit."""
+
+class Job:
+    """One schedule generation request and everything it has produced so far."""
+
+    def __init__(self, kwargs, timeout):
+        self.id = uuid.uuid4().hex
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.status = QUEUED
+        self.stage = None
+        self.message = None
+        self.schedules = []
+        self.error = None
+        self.status_code = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.cancel_requested = threading.Event()
+
+    def apply_event(self, event):
+        """Fold an iter_schedule_events event into the job's partial results."""
+        if event['event'] == 'stage':
+            self.stage = event['stage']
+            self.message = event['message']
+        elif event['event'] == 'schedule':
+            self.schedules.append(event['option'])
+        elif event['event'] == 'analysis':
+            self.schedules[event['index']]['pros'] = event['pros']
+            self.schedules[event['index']]['cons'] = event['cons']
+
+    def finish(self, status, error=None, status_code=None):
+        self.status = status
+        self.error = error
+        self.status_code = status_code
+        self.finished_at = time.time()
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'message': self.message,
+            'schedules': self.schedules,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+class JobQueue:
+    """
+    Bounded worker pool for schedule generation.
+
+    `run` is a callable taking the job kwargs and returning an iterator of
+    converse_api.iter_schedule_events events. Timeouts and cancellation
+    are cooperative: they are checked between events, and the event
+    iterator is then closed (which also closes an open Bedrock stream).
+    `run` should keep producing events while it waits on other work (see
+    singleflight.SingleFlight.stream's wait_event).
+    A single stage that hangs is bounded by its own network timeouts.
+    """
+
+    def __init__(self, run, max_workers=MAX_WORKERS, max_queued=MAX_QUEUED,
+                 timeout=JOB_TIMEOUT, result_ttl=RESULT_TTL):
+        self.run = run
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='schedule-job')
+
+    def _active(self):
+        return sum(1 for job in self._jobs.values() if job.status in (QUEUED, RUNNING))
+
+    def _purge(self):
+        cutoff = time.time() - self.result_ttl
+        for job_id in [j.id for j in self._jobs.values()
+                       if j.status in FINISHED and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def submit(self, kwargs, timeout=None):
+        """
+        Queue a job.
+
+        Returns:
+            The new Job
+
+        Raises:
+            QueueFullError: if max_workers + max_queued jobs are already active
+        """
+        with self._lock:
+            self._purge()
+            if self._active() >= self.max_workers + self.max_queued:
+                raise QueueFullError(
+                    f"Too many schedule requests in progress ({self.max_workers + self.max_queued}); "
+                    f"try again shortly")
+            job = Job(kwargs, timeout or self.timeout)
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._run_job, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            The Job, or None if unknown
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_requested.set()
+        if job.future.cancel():
+            # Never started
+            job.finish(CANCELLED)
+        return job
+
+    def _run_job(self, job):
+        if job.cancel_requested.is_set():
+            job.finish(CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        deadline = job.started_at + job.timeout
+        timing = metrics.Trace('job', job_id=job.id)
+        token = timing.activate()
+        events = self.run(**job.kwargs)
+        try:
+            for event in events:
+                job.apply_event(event)
+                if job.cancel_requested.is_set():
+                    job.finish(CANCELLED)
+                    return
+                if time.time() > deadline:
+                    print(f"⚠️ Job {job.id} timed out after {job.timeout:g}s")
+                    job.finish(TIMED_OUT, f"Timed out after {job.timeout:g} seconds", 504)
+                    return
+            job.finish(SUCCEEDED)
+        except CourseNotFoundError as e:
+            job.finish(FAILED, str(e), 404)
+        except NoValidScheduleError as e:
+            job.finish(FAILED, str(e), 422)
+        except Exception as e:
+            print(f"❌ Job {job.id} failed: {e}")
+            job.finish(FAILED, str(e), 500)
+        finally:
+            if hasattr(events, 'close'):
+                events.close()
+            timing.deactivate(token)
+            timing.finish(job.status_code or 200, job_status=job.status)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {'max_workers': self.max_workers, 'max_queued': self.max_queued, 'jobs': counts}
@@ -0,0 +1,160 @@
+import json
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+class JsonArrayStreamParser:
+    """
+    Incremental parser for a JSON array arriving in pieces (LLM stream deltas).
+
+    Text before the opening "[" (e.g. "Here are the schedules:" or a
+    ```json fence) is ignored. Each top-level element is parsed and
+    returned by feed() as soon as its closing character arrives, so the
+    caller can act on it, or stop the stream, without waiting for the rest.
+
+        parser = JsonArrayStreamParser()
+        for delta in deltas:
+            for item in parser.feed(delta):
+                ...
+        leftovers = parser.close()
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self._element = []      # text of the element being read
+        self._stack = []        # open brackets inside the current element
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text):
+        """
+        Consume the next piece of text.
+
+        Returns:
+            List of elements completed by this piece (possibly empty)
+        """
+        completed = []
+        for ch in text:
+            if self.finished:
+                break
+            if not self.started:
+                if ch == '[':
+                    self.started = True
+                continue
+
+            if self._in_string:
+                self._element.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if not self._stack and ch in ',]':
+                # End of a top-level element (or of the array)
+                self._flush(completed)
+                if ch == ']':
+                    self.finished = True
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in _CLOSERS:
+                self._stack.append(ch)
+            elif ch in '}]' and self._stack:
+                self._stack.pop()
+            self._element.append(ch)
+        return completed
+
+    def _flush(self, completed):
+        text = ''.join(self._element).strip()
+        self._element = []
+        if not text:
+            return
+        try:
+            completed.append(json.loads(text))
+        except json.JSONDecodeError:
+            # Malformed element; skip it rather than failing the whole array
+            pass
+
+    def close(self):
+        """
+        Finish parsing; repair an element cut off mid-way (e.g. by maxTokens).
+
+        Returns:
+            List with the repaired last element, if anything could be saved
+        """
+        if self.finished or not self.started:
+            return []
+        self.finished = True
+        text = ''.join(self._element).strip()
+        self._element = []
+        if not text:
+            return []
+        repaired = repair_truncated_json(text)
+        return [repaired] if repaired is not None else []
+
+def _structure(text):
+    """Open brackets and string state at the end of text, plus safe cut points."""
+    stack = []
+    in_string = False
+    escape = False
+    cuts = []
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(ch)
+        elif ch in '}]' and stack:
+            stack.pop()
+        elif ch == ',':
+            cuts.append(i)
+    return stack, in_string, cuts
+
+def _close(text):
+    stack, in_string, _ = _structure(text)
+    if in_string:
+        text += '"'
+    return text + ''.join(_CLOSERS[b] for b in reversed(stack))
+
+def repair_truncated_json(text):
+    """
+    Best-effort parse of a JSON value whose end is missing.
+
+    Open strings and brackets are closed; if that alone does not parse
+    (a dangling key, ":" or half-written literal), the text is cut back to
+    the last complete member and closed again.
+
+    Returns:
+        The parsed value, or None if nothing usable is left
+    """
+    _, _, cuts = _structure(text)
+    for end in [len(text)] + list(reversed(cuts)):
+        candidate = text[:end].rstrip().rstrip(',')
+        if not candidate:
+            break
+        try:
+            return json.loads(_close(candidate))
+        except json.JSONDecodeError:
+            continue
+    return None
+
+def parse_json_array(text):
+    """
+    Parse a complete (or truncated) model response that should hold a JSON array.
+
+    Returns:
+        List of elements; empty if no array was found
+    """
+    parser = JsonArrayStreamParser()
+    return parser.feed(text) + parser.close()
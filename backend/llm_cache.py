@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(BACKEND_DIR, 'llm_cache'))
+MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+
+def cache_key(request, catalog_etag=None):
+    """
+    Content address of a converse_stream request.
+
+    Args:
+        request: converse_stream keyword arguments (modelId, messages,
+            inferenceConfig, ...)
+        catalog_etag: ETag of the catalog the prompt was built from, so
+            entries go stale when the catalog changes
+
+    Returns:
+        Hex sha256 digest
+    """
+    payload = json.dumps({'request': request, 'catalog_etag': catalog_etag},
+                         sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ReplayStream:
+    """Iterates recorded converse_stream events like a live EventStream."""
+
+    def __init__(self, events):
+        self.events = events
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def close(self):
+        pass
+
+class RecordingStream:
+    """
+    Passes a live EventStream through while recording its events.
+
+    The recording is stored when the stream is read to the end, or when
+    the reader called mark_complete() before closing it early; a stream
+    abandoned half-way (cancelled request) is not cached.
+    """
+
+    def __init__(self, stream, on_complete):
+        self.stream = stream
+        self.events = []
+        self.complete = False
+        self._on_complete = on_complete
+        self._saved = False
+
+    def __iter__(self):
+        for event in self.stream:
+            self.events.append(event)
+            yield event
+        self.complete = True
+        self._save()
+
+    def _save(self):
+        if self.complete and not self._saved:
+            self._saved = True
+            self._on_complete(self.events)
+
+    def close(self):
+        self._save()
+        if hasattr(self.stream, 'close'):
+            self.stream.close()
+
+def mark_complete(response):
+    """
+    Tell a recording stream that what has been read so far is a usable answer.
+
+    For readers that stop early once they have everything they need; a
+    no-op for live or replayed streams.
+    """
+    stream = response.get("stream")
+    if isinstance(stream, RecordingStream):
+        stream.complete = True
+
+class LLMCache:
+    """
+    On-disk cache of converse_stream event sequences, keyed by cache_key().
+
+    One JSON file per entry, sharded by the first two hex digits. Reads
+    bump the file's mtime; when the directory grows past max_bytes the
+    least recently used files are removed.
+    """
+
+    def __init__(self, path=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Recorded events for key, or None."""
+        path = self._file(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                events = json.load(f)['events']
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return events
+
+    def put(self, key, events):
+        path = self._file(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'created': time.time(), 'events': events}, f, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write LLM cache entry: {e}")
+            return
+        self.stats['stores'] += 1
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.path):
+                for name in files:
+                    if not name.endswith('.json'):
+                        continue
+                    full = os.path.join(root, name)
+                    try:
+                        st = os.stat(full)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, full))
+                    total += st.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, full in sorted(entries):
+                try:
+                    os.remove(full)
+                except OSError:
+                    continue
+                self.stats['evictions'] += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def converse_stream(self, client, catalog_etag=None, fresh=False, **request):
+        """
+        client.converse_stream(**request), served from the cache when possible.
+
+        Args:
+            client: Bedrock runtime client
+            catalog_etag: Included in the key (see cache_key)
+            fresh: Skip the lookup (the new response is still recorded)
+            **request: converse_stream arguments
+
+        Returns:
+            A converse_stream-style response; "stream" is a ReplayStream
+            on a hit and a RecordingStream otherwise
+        """
+        key = cache_key(request, catalog_etag)
+        if not fresh:
+            events = self.get(key)
+            if events is not None:
+                print(f"💾 LLM cache hit {key[:12]}")
+                return {'stream': ReplayStream(events)}
+
+        response = client.converse_stream(**request)
+        return dict(response, stream=RecordingStream(response['stream'], lambda events: self.put(key, events)))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Process-wide LLMCache, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
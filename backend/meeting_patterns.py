@@ -0,0 +1,308 @@
+import math
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from course_index import parse_course_key
+
+# Calendar (RFC 5545) day codes, Monday first
+DAY_CODES = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+# Longest tokens first so "TH" wins over "T", "THU" over "TH" and "TUES"
+# over "TUE" (else its "S" would read as Saturday)
+DAY_TOKENS = [
+    ('WEDNESDAY', 'WE'), ('THURSDAY', 'TH'), ('SATURDAY', 'SA'), ('TUESDAY', 'TU'),
+    ('MONDAY', 'MO'), ('FRIDAY', 'FR'), ('SUNDAY', 'SU'),
+    ('THURS', 'TH'), ('TUES', 'TU'), ('WEDS', 'WE'), ('THUR', 'TH'),
+    ('MON', 'MO'), ('TUE', 'TU'), ('WED', 'WE'), ('THU', 'TH'), ('FRI', 'FR'), ('SAT', 'SA'), ('SUN', 'SU'),
+    ('TH', 'TH'), ('TU', 'TU'), ('SA', 'SA'), ('SU', 'SU'),
+    ('M', 'MO'), ('T', 'TU'), ('W', 'WE'), ('R', 'TH'), ('F', 'FR'), ('S', 'SA'), ('U', 'SU'),
+]
+
+DAY_ABBREVIATIONS = {'MO': 'M', 'TU': 'T', 'WE': 'W', 'TH': 'TH', 'FR': 'F', 'SA': 'SA', 'SU': 'SU'}
+
+# "1:00 PM - 2:05 PM", "1:00-2:05 pm", "8:00-12:10pm", "10am - 11:05am"
+TIME_RANGE_PATTERN = re.compile(
+    r"(\d{1,2})(?::(\d{2}))?\s*([ap])?\.?m?\.?\s*[-–—]\s*(\d{1,2})(?::(\d{2}))?\s*([ap])\.?m?\.?",
+    re.IGNORECASE
+)
+
+# Date ranges sometimes prefix a pattern: "9/22/2025 - 12/5/2025 | MWF | ..."
+DATE_RANGE_PATTERN = re.compile(r"\d{1,2}/\d{1,2}/\d{2,4}\s*-\s*\d{1,2}/\d{1,2}/\d{2,4}")
+
+TBA_PATTERN = re.compile(r"\b(TBA|TBD|ONLINE|ASYNC\w*|ARRANGED|BY ARRANGEMENT|INDEPENDENT STUDY)\b", re.IGNORECASE)
+
+class MeetingPatternError(ValueError):
+    """A Meeting Patterns string could not be understood."""
+
+@dataclass(frozen=True)
+class Meeting:
+    """One weekly meeting: the same time range on one or more days."""
+    days: tuple
+    start: int  # minutes after midnight
+    end: int
+    location: str = ''
+
+    def format_time(self):
+        """Compact form used in prompts, e.g. "MWF 1:00-2:05 pm"."""
+        days = ''.join(DAY_ABBREVIATIONS[d] for d in self.days)
+        return f"{days} {_format_clock(self.start)}-{_format_clock(self.end, meridiem=True)}"
+
+@dataclass
+class SectionRecord:
+    """A catalog row with its meeting patterns parsed."""
+    course_section: str  # "MATH 51-2"
+    course: str  # "MATH 51"
+    class_number: str
+    teacher: str
+    instructors: tuple = ()
+    meetings: tuple = ()
+    tba: bool = False
+    location: str = ''
+    status: str = ''
+    enrolled: str = ''
+    start_date: date = None
+    end_date: date = None
+    time: str = ''  # raw "Meeting Patterns" text
+
+    def to_prompt_dict(self):
+        """The {class number, course section, teacher, time} shape step 1 produced."""
+        return {
+            'class number': self.class_number,
+            'course section': self.course_section,
+            'teacher': self.teacher,
+            'time': '; '.join(m.format_time() for m in self.meetings) or 'TBA',
+        }
+
+def _format_clock(minutes, meridiem=False):
+    hour, minute = divmod(minutes, 60)
+    suffix = ' am' if hour < 12 else ' pm'
+    hour = hour % 12 or 12
+    return f"{hour}:{minute:02d}{suffix if meridiem else ''}"
+
+def _is_missing(value):
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    return type(value).__name__ in ('NAType', 'NaTType')
+
+def _text(value):
+    return '' if _is_missing(value) else str(value).strip()
+
+def parse_days(text):
+    """
+    Parse day codes such as "MWF", "TTH", "M W F", "TuTh", "Mon/Wed" or
+    "Tues/Thurs".
+
+    Returns:
+        Tuple of calendar day codes in week order, e.g. ('TU', 'TH')
+    """
+    compact = re.sub(r"[\s,/&.]+", '', text.upper())
+    if not compact:
+        raise MeetingPatternError(f"No days in {text!r}")
+    days = set()
+    pos = 0
+    while pos < len(compact):
+        for token, code in DAY_TOKENS:
+            if compact.startswith(token, pos):
+                days.add(code)
+                pos += len(token)
+                break
+        else:
+            raise MeetingPatternError(f"Unknown day code in {text!r}")
+    return tuple(d for d in DAY_CODES if d in days)
+
+def parse_time_range(text):
+    """
+    Parse a time range into (start, end) minutes after midnight.
+
+    A start time without am/pm takes the end's meridiem unless that would put
+    it after the end ("11:00-12:05 pm" starts at 11 am).
+    """
+    match = TIME_RANGE_PATTERN.search(text)
+    if not match:
+        raise MeetingPatternError(f"No time range in {text!r}")
+    sh, sm, smer, eh, em, emer = match.groups()
+
+    def to_minutes(hour, minute, mer):
+        hour = int(hour) % 12
+        if mer.lower() == 'p':
+            hour += 12
+        return hour * 60 + int(minute or 0)
+
+    end = to_minutes(eh, em, emer)
+    if smer:
+        start = to_minutes(sh, sm, smer)
+    else:
+        start = to_minutes(sh, sm, emer)
+        if start > end:
+            start = to_minutes(sh, sm, 'a')
+    if not (0 <= start < end <= 24 * 60):
+        raise MeetingPatternError(f"Invalid time range in {text!r}")
+    return start, end
+
+def parse_meeting_pattern(text):
+    """
+    Parse a single pattern like "MWF | 1:00 PM - 2:05 PM | Daly Science 300".
+
+    Returns:
+        Meeting, or None for TBA/online patterns with no fixed time
+    """
+    text = DATE_RANGE_PATTERN.sub('', text).strip(' |')
+    match = TIME_RANGE_PATTERN.search(text)
+    if not match:
+        if TBA_PATTERN.search(text):
+            return None
+        raise MeetingPatternError(f"Unrecognized meeting pattern {text!r}")
+    start, end = parse_time_range(match.group(0))
+
+    before = text[:match.start()].strip(' |')
+    after = text[match.end():].strip(' |')
+    # Day codes normally precede the time, but "1:00-2:05 pm MWF" also occurs
+    day_text = before.split('|')[-1] if before else after.split('|')[0]
+    location = after if before else '|'.join(after.split('|')[1:])
+    return Meeting(days=parse_days(day_text), start=start, end=end, location=location.strip(' |'))
+
+def split_patterns(text):
+    return [p.strip() for p in re.split(r"[\n;]+", text) if p.strip()]
+
+def parse_meeting_patterns(text):
+    """
+    Parse a full "Meeting Patterns" cell, which may hold several patterns.
+
+    Returns:
+        (tuple of Meeting, tba flag). An empty cell counts as TBA.
+
+    Raises:
+        MeetingPatternError: if any pattern cannot be parsed
+    """
+    meetings = []
+    tba = False
+    for pattern in split_patterns(text):
+        meeting = parse_meeting_pattern(pattern)
+        if meeting is None:
+            tba = True
+        else:
+            meetings.append(meeting)
+    return tuple(meetings), tba or not meetings
+
+def parse_instructors(text):
+    return tuple(name.strip() for name in re.split(r"[\n;]+", text) if name.strip())
+
+def parse_date(value):
+    if _is_missing(value):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    for fmt in ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def parse_section_row(row, class_numbers):
+    """
+    Turn one catalog row (dict keyed by catalog column) into a SectionRecord.
+
+    Args:
+        row: Mapping with "Course Section", "All Instructors", "Meeting Patterns", ...
+        class_numbers: Dict of course -> class number, extended in place
+
+    Raises:
+        MeetingPatternError: if the row cannot be parsed
+    """
+    label = _text(row.get("Course Section"))
+    key = parse_course_key(label)
+    if not key or not key[2]:
+        raise MeetingPatternError(f"Unrecognized course section {label!r}")
+    subject, number, section = key
+    course = f"{subject} {number}"
+    class_number = class_numbers.setdefault(course, str(len(class_numbers) + 1))
+
+    meetings, tba = parse_meeting_patterns(_text(row.get("Meeting Patterns")))
+    locations = split_patterns(_text(row.get("Locations")))
+    if len(locations) == len(meetings):
+        meetings = tuple(
+            Meeting(m.days, m.start, m.end, m.location or loc) for m, loc in zip(meetings, locations)
+        )
+    location = '; '.join(locations)
+    if not location:
+        location = '; '.join(m.location for m in meetings if m.location)
+
+    instructors = parse_instructors(_text(row.get("All Instructors")))
+    return SectionRecord(
+        course_section=f"{course}-{section}",
+        course=course,
+        class_number=class_number,
+        teacher=instructors[0] if instructors else '',
+        instructors=instructors,
+        meetings=meetings,
+        tba=tba,
+        location=location,
+        status=_text(row.get("Section Status")),
+        enrolled=_text(row.get("Enrolled/Capacity")),
+        start_date=parse_date(row.get("Start Date")),
+        end_date=parse_date(row.get("End Date")),
+        time=_text(row.get("Meeting Patterns")),
+    )
+
+def parse_sections(rows, course_order=None):
+    """
+    Parse catalog rows into SectionRecords.
+
+    Args:
+        rows: Iterable of row mappings (e.g. DataFrame.to_dict('records'))
+        course_order: Requested courses; fixes their class numbers in this order
+
+    Returns:
+        (list of SectionRecord, list of rows that could not be parsed)
+    """
+    class_numbers = {}
+    for course in course_order or []:
+        key = parse_course_key(course)
+        if key:
+            class_numbers.setdefault(f"{key[0]} {key[1]}", str(len(class_numbers) + 1))
+
+    records = []
+    unparsed = []
+    for row in rows:
+        try:
+            records.append(parse_section_row(row, class_numbers))
+        except MeetingPatternError:
+            unparsed.append(row)
+    return records, unparsed
+
+def section_from_prompt_dict(entry, class_numbers=None):
+    """
+    Build a SectionRecord from a step-1 style dict (LLM fallback output).
+
+    Returns None if its "time" field cannot be parsed either.
+    """
+    label = str(entry.get('course section', ''))
+    key = parse_course_key(label)
+    if not key or not key[2]:
+        return None
+    try:
+        meetings, tba = parse_meeting_patterns(str(entry.get('time', '')))
+    except MeetingPatternError:
+        return None
+    course = f"{key[0]} {key[1]}"
+    class_number = str(entry.get('class number', ''))
+    if class_numbers is not None:
+        class_number = class_numbers.setdefault(course, class_number or str(len(class_numbers) + 1))
+    teacher = str(entry.get('teacher', '')).strip()
+    return SectionRecord(
+        course_section=f"{course}-{key[2]}",
+        course=course,
+        class_number=class_number,
+        teacher=teacher,
+        instructors=(teacher,) if teacher else (),
+        meetings=meetings,
+        tba=tba,
+        time=str(entry.get('time', '')),
+    )
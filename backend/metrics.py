@@ -0,0 +1,226 @@
+import bisect
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets (seconds), from a cached lookup to a slow Bedrock call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labels, key, value) for key, value in sorted(self._values.items())]
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics), optionally split by labels."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    out.append((f"{self.name}_bucket", self.labels + ('le',), key + (_number(bound),), cumulative))
+                out.append((f"{self.name}_sum", self.labels, key, total))
+                out.append((f"{self.name}_count", self.labels, key, count))
+        return out
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labels, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._get(Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, label_names, label_values, value in metric.samples():
+                lines.append(f"{name}{_label_text(label_names, label_values)} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'schedule_stage_seconds', 'Time spent in each pipeline stage', ('stage',))
+STAGE_ERRORS = REGISTRY.counter(
+    'schedule_stage_errors_total', 'Pipeline stages that raised', ('stage',))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_seconds', 'End-to-end API request time', ('route', 'status'))
+BEDROCK_TTFT = REGISTRY.histogram(
+    'bedrock_time_to_first_token_seconds', 'Time from converse_stream call to first text delta', ('call',))
+BEDROCK_SECONDS = REGISTRY.histogram(
+    'bedrock_call_seconds', 'Time from converse_stream call until the stream was finished or closed', ('call',))
+BEDROCK_TOKENS = REGISTRY.counter(
+    'bedrock_tokens_total', 'Tokens reported by converse_stream metadata', ('call', 'kind'))
+LLM_CACHE_REPLAYS = REGISTRY.counter(
+    'llm_cache_replays_total', 'converse_stream responses replayed from the LLM cache instead of Bedrock', ('call',))
+RMP_SECONDS = REGISTRY.histogram(
+    'rmp_request_seconds', 'RateMyProfessors GraphQL request time, per attempt', ('operation', 'outcome'))
+GCAL_SECONDS = REGISTRY.histogram(
+    'gcal_request_seconds', 'Google Calendar API round trip time', ('operation',))
+GCAL_REQUESTS = REGISTRY.counter(
+    'gcal_requests_total', 'Google Calendar API requests sent (batched requests count individually)',
+    ('operation', 'outcome'))
+
+# Trace of the request being handled, if any
+_current = contextvars.ContextVar('metrics_trace', default=None)
+
+class Trace:
+    """
+    Per-request stage breakdown, logged as one JSON line when finished.
+
+    Stages nest (e.g. "catalog" includes "s3_download" when the catalog had
+    to be fetched), so the stage times can add up to more than total_ms.
+    """
+
+    def __init__(self, route, **fields):
+        self.route = route
+        self.fields = fields
+        self.stages = {}
+        self.started = time.perf_counter()
+        self._finished = False
+
+    def activate(self):
+        """Make this the current trace of the calling context; returns a reset token."""
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self, status=200, **fields):
+        if self._finished:
+            return
+        self._finished = True
+        total = time.perf_counter() - self.started
+        REQUEST_SECONDS.observe(total, route=self.route, status=status)
+        print(json.dumps({
+            'event': 'request_timing',
+            'route': self.route,
+            'status': status,
+            'total_ms': round(total * 1000, 1),
+            'stages_ms': {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+            **self.fields,
+            **fields,
+        }))
+
+def record(name, seconds):
+    """Add time to a stage of the current trace."""
+    current = _current.get()
+    if current is not None:
+        current.add(name, seconds)
+
+@contextmanager
+def stage(name):
+    """
+    Time a pipeline stage: observed in schedule_stage_seconds and added to
+    the current trace, if any.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        record(name, elapsed)
+
+@contextmanager
+def trace(route, **fields):
+    """
+    Trace the enclosed block as one request.
+
+    Yields:
+        The Trace; set trace.status to log something other than 200
+        (500 is logged if the block raises)
+    """
+    current = Trace(route, **fields)
+    current.status = 200
+    token = current.activate()
+    try:
+        yield current
+    except BaseException:
+        current.status = 500
+        raise
+    finally:
+        current.deactivate(token)
+        current.finish(current.status)
+
+def render():
+    """All metrics in the Prometheus text format."""
+    return REGISTRY.render()
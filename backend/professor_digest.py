@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import datetime, timezone
+
+from prompt_encoding import estimate_tokens
+
+# Ratings lose half their weight after this many days
+RECENCY_HALF_LIFE_DAYS = float(os.getenv("RMP_DIGEST_HALF_LIFE_DAYS", "365"))
+MAX_TAGS = 5
+MAX_COMMENTS = 3
+COMMENT_CHARS = 240
+
+# Approximate token budget for all professor digests in one prompt
+PROMPT_PROFESSOR_TOKEN_BUDGET = int(os.getenv("PROMPT_PROFESSOR_TOKEN_BUDGET", "1500"))
+
+def _parse_rating_date(value):
+    # RMP dates look like "2023-05-12 19:41:36 +0000 UTC"
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def _recency_weight(rated_at, now, half_life_days):
+    if rated_at is None:
+        return 0.5
+    age_days = max(0.0, (now - rated_at).total_seconds() / 86400)
+    return 0.5 ** (age_days / half_life_days)
+
+def _split_tags(tags):
+    if isinstance(tags, list):
+        return [t.strip() for t in tags if t and t.strip()]
+    return [t.strip() for t in str(tags or '').split('--') if t.strip()]
+
+def source_hash(combined):
+    """Hash of the professor info and comments a digest is built from."""
+    source = {'professor_info': combined.get('professor_info'), 'comments': combined.get('comments') or []}
+    return hashlib.sha256(json.dumps(source, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def build_digest(combined, now=None, half_life_days=RECENCY_HALF_LIFE_DAYS,
+                 max_tags=MAX_TAGS, max_comments=MAX_COMMENTS):
+    """
+    Summarize professorRater output into a compact, prompt-sized digest.
+
+    Args:
+        combined: {"professor_info": {...}, "comments": [...]} from ratemyprof_info
+        now: Reference time for recency weighting (defaults to now, UTC)
+        half_life_days: Age at which a rating counts half as much
+        max_tags, max_comments: How many tags / comments to keep
+
+    Returns:
+        Dict with rating stats, recency-weighted tag counts and a few
+        representative (recent, substantive) comments
+    """
+    now = now or datetime.now(timezone.utc)
+    info = combined.get('professor_info') or {}
+    comments = combined.get('comments') or []
+
+    tag_weights = Counter()
+    tag_counts = Counter()
+    scored_comments = []
+    recent = 0
+    for rating in comments:
+        rated_at = _parse_rating_date(rating.get('date', ''))
+        weight = _recency_weight(rated_at, now, half_life_days)
+        if rated_at and (now - rated_at).days <= 365:
+            recent += 1
+        for tag in _split_tags(rating.get('tags')):
+            tag_counts[tag] += 1
+            tag_weights[tag] += weight
+        text = ' '.join(str(rating.get('comment') or '').split())
+        if text:
+            # Prefer recent comments with some substance
+            scored_comments.append((weight * min(len(text), 300) / 300, text))
+
+    scored_comments.sort(key=lambda c: -c[0])
+    picked = []
+    seen = set()
+    for _, text in scored_comments:
+        if len(picked) >= max_comments:
+            break
+        if text not in seen:
+            seen.add(text)
+            picked.append(text if len(text) <= COMMENT_CHARS else text[:COMMENT_CHARS - 1] + '…')
+
+    return {
+        'name': ' '.join(p for p in (info.get('firstName'), info.get('lastName')) if p),
+        'department': info.get('department'),
+        'avgRating': info.get('avgRating'),
+        'avgDifficulty': info.get('avgDifficulty'),
+        'numRatings': info.get('numRatings'),
+        'wouldTakeAgainPercent': round(info['wouldTakeAgainPercent']) if isinstance(
+            info.get('wouldTakeAgainPercent'), (int, float)) and info['wouldTakeAgainPercent'] >= 0 else None,
+        'recentRatings': recent,
+        'tags': {tag: tag_counts[tag] for tag, _ in tag_weights.most_common(max_tags)},
+        'comments': picked,
+    }
+
+def fit_digests(digests, budget=PROMPT_PROFESSOR_TOKEN_BUDGET):
+    """
+    Shrink digests until their JSON fits the token budget.
+
+    Comments are dropped first (lowest-ranked first, across all
+    professors), then tags are cut down; rating stats are always kept.
+
+    Args:
+        digests: Dict of reference id -> digest
+        budget: Approximate token budget
+
+    Returns:
+        New dict of reference id -> trimmed digest
+    """
+    fitted = {ref: dict(d, comments=list(d.get('comments', [])), tags=dict(d.get('tags', {})))
+              for ref, d in digests.items()}
+
+    def size():
+        return estimate_tokens(json.dumps(fitted, separators=(',', ':'), ensure_ascii=False))
+
+    max_comments = max((len(d['comments']) for d in fitted.values()), default=0)
+    while size() > budget and max_comments > 0:
+        max_comments -= 1
+        for d in fitted.values():
+            del d['comments'][max_comments:]
+
+    max_tags = max((len(d['tags']) for d in fitted.values()), default=0)
+    while size() > budget and max_tags > 0:
+        max_tags -= 1
+        for d in fitted.values():
+            d['tags'] = dict(list(d['tags'].items())[:max_tags])
+
+    for d in fitted.values():
+        if not d['comments']:
+            del d['comments']
+        if not d['tags']:
+            del d['tags']
+    return fitted
@@ -0,0 +1,176 @@
+import math
+import os
+from collections import Counter
+
+from course_index import parse_course_key
+
+# Approximate token budget for catalog rows embedded in a prompt
+PROMPT_CATALOG_TOKEN_BUDGET = int(os.getenv("PROMPT_CATALOG_TOKEN_BUDGET", "2000"))
+
+# Columns whose repeated values are interned once in a dictionary block
+INTERNED_COLUMNS = {
+    "All Instructors": 'I',
+    "Locations": 'L',
+    "Start Date": 'D',
+    "End Date": 'D',
+}
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English/JSON)."""
+    return math.ceil(len(text) / 4)
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and math.isnan(value):
+        return ''
+    if type(value).__name__ in ('NAType', 'NaTType'):
+        return ''
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    # Keep one row per line and the delimiter unambiguous
+    return ' '.join(str(value).replace('|', '/').split())
+
+def rank_rows(rows):
+    """
+    Order rows so a truncated prefix is still useful.
+
+    Rows are interleaved round-robin across courses (every course gets its
+    sections in before any course gets a second helping), open sections
+    first within each course.
+    """
+    by_course = {}
+    for row in rows:
+        key = parse_course_key(_cell(row.get("Course Section")))
+        course = key[:2] if key else None
+        by_course.setdefault(course, []).append(row)
+    queues = [
+        sorted(course_rows, key=lambda r: _cell(r.get("Section Status")).upper() != 'OPEN')
+        for course_rows in by_course.values()
+    ]
+    ranked = []
+    while any(queues):
+        for queue in queues:
+            if queue:
+                ranked.append(queue.pop(0))
+    return ranked
+
+def encode_rows(rows, columns, budget=PROMPT_CATALOG_TOKEN_BUDGET):
+    """
+    Encode catalog rows as a dense, dictionary-compressed table.
+
+    Values in INTERNED_COLUMNS that occur more than once are replaced by
+    short ids (I1, L2, D1, ...) defined once in a header, cells are joined
+    with "|" and no padding is emitted. Rows are added in rank_rows order
+    until the token budget is reached.
+
+    Args:
+        rows: List of row mappings (e.g. DataFrame.to_dict('records'))
+        columns: Columns to include, in order
+        budget: Approximate token budget for the whole block
+
+    Returns:
+        (text, number of rows included, number of rows left out)
+    """
+    columns = [c for c in columns if any(c in row for row in rows)] if rows else list(columns)
+    ranked = rank_rows(rows)
+
+    counts = Counter()
+    for row in ranked:
+        for col in columns:
+            if col in INTERNED_COLUMNS:
+                value = _cell(row.get(col))
+                if value:
+                    counts[(INTERNED_COLUMNS[col], value)] += 1
+
+    ids = {}
+    definitions = {}
+    lines = []
+    used = 0
+    header = "|".join(columns)
+    fixed_tokens = estimate_tokens(header) + 40  # header lines and legend
+
+    def encode_cell(col, value):
+        prefix = INTERNED_COLUMNS.get(col)
+        if not prefix or not value or counts[(prefix, value)] < 2:
+            return value, None
+        key = (prefix, value)
+        if key in ids:
+            return ids[key], None
+        ids[key] = f"{prefix}{sum(1 for k in ids if k[0] == prefix) + 1}"
+        return ids[key], key
+
+    for row in ranked:
+        new_keys = []
+        cells = []
+        for col in columns:
+            encoded, new_key = encode_cell(col, _cell(row.get(col)))
+            cells.append(encoded)
+            if new_key:
+                new_keys.append(new_key)
+        line = "|".join(cells)
+        cost = estimate_tokens(line) + sum(estimate_tokens(f"{ids[k]}={k[1]};") for k in new_keys)
+        if lines and used + cost + fixed_tokens > budget:
+            # Roll back ids introduced by the row that did not fit
+            for k in new_keys:
+                del ids[k]
+            break
+        for k in new_keys:
+            definitions[ids[k]] = k[1]
+        lines.append(line)
+        used += cost
+
+    legend = []
+    for prefix, name in (('I', 'Instructors'), ('L', 'Locations'), ('D', 'Dates')):
+        entries = [f"{ref}={value}" for ref, value in definitions.items() if ref.startswith(prefix)]
+        if entries:
+            legend.append(f"{name}: " + "; ".join(entries))
+
+    omitted = len(ranked) - len(lines)
+    parts = legend + [header] + lines
+    if omitted:
+        parts.append(f"({omitted} more sections omitted)")
+    return "\n".join(parts), len(lines), omitted
+
+# Catalog columns worth sending to the model, in prompt order
+CATALOG_PROMPT_COLUMNS = [
+    "Course Section",
+    "All Instructors",
+    "Meeting Patterns",
+    "Locations",
+    "Start Date",
+    "End Date",
+    "Section Status",
+    "Enrolled/Capacity",
+]
+
+def encode_catalog(df, columns=CATALOG_PROMPT_COLUMNS, budget=PROMPT_CATALOG_TOKEN_BUDGET):
+    """
+    encode_rows for a catalog DataFrame.
+
+    Returns:
+        (text, number of rows included, number of rows left out)
+    """
+    columns = [c for c in columns if c in df.columns]
+    return encode_rows(df[columns].to_dict('records'), columns, budget)
+
+def log_token_usage(label, estimated_tokens, usage):
+    """
+    Print estimated vs. actual prompt size from a converse_stream metadata event.
+
+    Args:
+        label: Which prompt this was (e.g. "step 1")
+        estimated_tokens: estimate_tokens() of the prompt text
+        usage: The metadata event's "usage" dict (may be None)
+    """
+    usage = usage or {}
+    # With prompt caching, inputTokens only counts the uncached part
+    cache_read = usage.get('cacheReadInputTokens', 0)
+    cache_write = usage.get('cacheWriteInputTokens', 0)
+    actual = usage.get('inputTokens', 0) + cache_read + cache_write
+    if actual:
+        cache = f", cache read {cache_read} / write {cache_write}" if cache_read or cache_write else ""
+        print(f"📏 {label}: ~{estimated_tokens} input tokens estimated, {actual} actual "
+              f"({(estimated_tokens - actual) / actual:+.0%}), {usage.get('outputTokens')} output{cache}")
+    else:
+        print(f"📏 {label}: ~{estimated_tokens} input tokens estimated")
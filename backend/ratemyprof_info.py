@@ -1,7 +1,17 @@
 import requests
 import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import List, Dict, Any
 
+import metrics
+import professor_digest
+import rmp_cache
+
 SCHOOL_ID = "U2Nob29sLTg4Mg=="
 
 HEADERS = {
@@ -12,8 +22,137 @@ HEADERS = {
     "Referer": "https://www.ratemyprofessors.com/",
 }
 
-def get_professor_info(first_name, last_name):
-    url = "https://www.ratemyprofessors.com/graphql"
+GRAPHQL_URL = os.getenv("RMP_GRAPHQL_URL", "https://www.ratemyprofessors.com/graphql")
+
+# Per-HTTP-call timeout and how many professors are looked up in parallel
+REQUEST_TIMEOUT = float(os.getenv("RMP_LOOKUP_TIMEOUT", "10"))
+MAX_CONCURRENCY = int(os.getenv("RMP_MAX_CONCURRENCY", "8"))
+
+# Keep-alive connection pool and retry policy for 429/5xx responses
+POOL_SIZE = int(os.getenv("RMP_POOL_SIZE", "16"))
+MAX_RETRIES = int(os.getenv("RMP_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("RMP_BACKOFF_BASE", "0.25"))
+BACKOFF_MAX = float(os.getenv("RMP_BACKOFF_MAX", "4"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Names / teacher ids resolved per aliased GraphQL request
+BATCH_SIZE = int(os.getenv("RMP_BATCH_SIZE", "10"))
+
+class RMPError(Exception):
+    """A RateMyProfessors request failed (as opposed to finding nothing)."""
+
+_session = None
+_session_lock = threading.Lock()
+_latency = {}
+_latency_lock = threading.Lock()
+
+def get_session():
+    """
+    Shared requests.Session for all RateMyProfessors calls.
+
+    Connections are kept alive and pooled (RMP_POOL_SIZE per host), so
+    repeated GraphQL calls skip TCP and TLS setup.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(HEADERS)
+            _session = session
+        return _session
+
+def _record_latency(endpoint, seconds, error=False, retried=False):
+    outcome = 'retried' if retried else 'error' if error else 'ok'
+    metrics.RMP_SECONDS.observe(seconds, operation=endpoint, outcome=outcome)
+    with _latency_lock:
+        stats = _latency.setdefault(endpoint, {
+            'count': 0, 'errors': 0, 'retries': 0, 'total_seconds': 0.0, 'max_seconds': 0.0
+        })
+        stats['count'] += 1
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        if error:
+            stats['errors'] += 1
+        if retried:
+            stats['retries'] += 1
+
+def latency_stats():
+    """Per-endpoint call counts and latency (seconds) since startup."""
+    with _latency_lock:
+        return {
+            endpoint: dict(stats, avg_seconds=stats['total_seconds'] / stats['count'] if stats['count'] else 0.0)
+            for endpoint, stats in _latency.items()
+        }
+
+def _backoff_delay(attempt, response=None):
+    """Exponential backoff with full jitter, honouring a numeric Retry-After."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def post_graphql(endpoint, query, variables, timeout=REQUEST_TIMEOUT):
+    """
+    POST a GraphQL query through the shared session.
+
+    Connection errors, timeouts and 429/5xx responses are retried up to
+    RMP_MAX_RETRIES times with jittered exponential backoff.
+
+    Args:
+        endpoint: Name used for latency stats (usually the operation name)
+        query, variables: GraphQL request
+        timeout: Per-attempt timeout in seconds
+
+    Returns:
+        Decoded JSON response
+
+    Raises:
+        RMPError: if the request still fails after retrying
+    """
+    session = get_session()
+    payload = {"query": query, "variables": variables}
+    for attempt in range(MAX_RETRIES + 1):
+        retryable = attempt < MAX_RETRIES
+        start = time.perf_counter()
+        try:
+            response = session.post(GRAPHQL_URL, json=payload, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _record_latency(endpoint, time.perf_counter() - start, error=True, retried=retryable)
+            if not retryable:
+                raise RMPError(f"Request failed: {e}")
+            time.sleep(_backoff_delay(attempt))
+            continue
+        except requests.RequestException as e:
+            _record_latency(endpoint, time.perf_counter() - start, error=True)
+            raise RMPError(f"Request failed: {e}")
+
+        failed = response.status_code != 200
+        if failed and response.status_code in RETRY_STATUSES and retryable:
+            _record_latency(endpoint, time.perf_counter() - start, error=True, retried=True)
+            time.sleep(_backoff_delay(attempt, response))
+            continue
+        _record_latency(endpoint, time.perf_counter() - start, error=failed)
+        if failed:
+            raise RMPError(f"Status code {response.status_code}")
+        try:
+            return response.json()
+        except ValueError:
+            raise RMPError(f"{endpoint} response is not JSON")
+
+def fetch_professor_info(first_name, last_name, timeout=REQUEST_TIMEOUT):
+    """
+    Search RateMyProfessors for a professor at SCU.
+
+    Returns:
+        The matching teacher node, or None if there is no exact name match
+
+    Raises:
+        RMPError: on HTTP or decoding errors
+    """
     query = """
     query TeacherSearchPaginationQuery($count: Int!, $cursor: String, $query: TeacherSearchQuery!) {
       search: newSearch {
@@ -41,27 +180,33 @@ def get_professor_info(first_name, last_name):
         "query": {"text": f"{first_name} {last_name}", "schoolID": SCHOOL_ID, "fallback": True}
     }
 
-    response = requests.post(url, headers=HEADERS, json={"query": query, "variables": variables}, timeout=10)
-    if response.status_code != 200:
-        print("Error: Status code", response.status_code)
-        return None
-
-    try:
-        data = response.json()
-    except json.JSONDecodeError:
-        print("Error: Response is not JSON")
-        return None
+    data = post_graphql("TeacherSearchPaginationQuery", query, variables, timeout=timeout)
 
     teachers = data.get("data", {}).get("search", {}).get("teachers", {}).get("edges", [])
-    for t in teachers:
+    return _match_teacher(teachers, first_name, last_name)
+
+def _match_teacher(edges, first_name, last_name):
+    for t in edges:
         node = t.get("node", {})
         if node.get("firstName", "").strip().lower() == first_name.strip().lower() and \
            node.get("lastName", "").strip().lower() == last_name.strip().lower():
             return node
     return None
 
-def get_professor_comments(professor_id, count=50):
-    url = "https://www.ratemyprofessors.com/graphql"
+def get_professor_info(first_name, last_name):
+    try:
+        return fetch_professor_info(first_name, last_name)
+    except RMPError as e:
+        print("Error:", e)
+        return None
+
+def fetch_professor_comments(professor_id, count=50, timeout=REQUEST_TIMEOUT):
+    """
+    Fetch up to `count` ratings for a teacher id.
+
+    Raises:
+        RMPError: on HTTP or decoding errors
+    """
     query = """
     query RatingsListQuery($count: Int!, $id: ID!, $courseFilter: String, $cursor: String) {
       node(id: $id) {
@@ -83,18 +228,12 @@ def get_professor_comments(professor_id, count=50):
     """
     variables = {"count": count, "id": professor_id, "courseFilter": None, "cursor": None}
 
-    response = requests.post(url, headers=HEADERS, json={"query": query, "variables": variables}, timeout=10)
-    if response.status_code != 200:
-        print("Error fetching comments:", response.status_code)
-        return []
-
-    try:
-        data = response.json()
-    except json.JSONDecodeError:
-        print("Comments response not JSON")
-        return []
+    data = post_graphql("RatingsListQuery", query, variables, timeout=timeout)
 
     edges = data.get("data", {}).get("node", {}).get("ratings", {}).get("edges", [])
+    return _parse_comment_edges(edges)
+
+def _parse_comment_edges(edges):
     comments = []
     for e in edges:
         n = e.get("node", {})
@@ -106,6 +245,141 @@ def get_professor_comments(professor_id, count=50):
         })
     return comments
 
+def get_professor_comments(professor_id, count=50):
+    try:
+        return fetch_professor_comments(professor_id, count)
+    except RMPError as e:
+        print("Error fetching comments:", e)
+        return []
+
+TEACHER_FIELDS = """
+    fragment TeacherFields on Teacher {
+      firstName
+      lastName
+      id
+      department
+      avgRating
+      avgDifficulty
+      numRatings
+      wouldTakeAgainPercent
+      school { name }
+    }
+"""
+
+def _chunks(items, size):
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _alias_errors(data):
+    """Map top-level alias -> message for GraphQL errors in a batched response."""
+    errors = {}
+    for error in data.get("errors") or []:
+        path = error.get("path") or []
+        if path:
+            errors.setdefault(str(path[0]), error.get("message", "GraphQL error"))
+    return errors
+
+def _run_batches(fetch_batch, items, batch_size, max_workers):
+    """Run fetch_batch over chunks of items concurrently and merge the results."""
+    results, errors = {}, {}
+    chunks = _chunks(items, batch_size)
+    if not chunks:
+        return results, errors
+    if len(chunks) == 1:
+        return fetch_batch(chunks[0])
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))),
+                            thread_name_prefix='rmp-batch') as executor:
+        for chunk_results, chunk_errors in executor.map(fetch_batch, chunks):
+            results.update(chunk_results)
+            errors.update(chunk_errors)
+    return results, errors
+
+def fetch_professor_info_batch(names, batch_size=BATCH_SIZE, max_workers=MAX_CONCURRENCY,
+                               timeout=REQUEST_TIMEOUT):
+    """
+    Search for many professors with one aliased GraphQL request per batch.
+
+    Args:
+        names: List of (first_name, last_name) tuples
+        batch_size: Names per request
+        max_workers: Batches in flight at once
+        timeout: Per-request timeout
+
+    Returns:
+        (results, errors): results maps each resolved name tuple to its
+        teacher node or None (not found); errors maps the name tuples that
+        failed to an error message. Every name lands in exactly one of them.
+    """
+    def fetch_batch(batch):
+        aliases = [f"s{i}" for i in range(len(batch))]
+        params = ", ".join(f"$q{i}: TeacherSearchQuery!" for i in range(len(batch)))
+        fields = "\n".join(
+            f"{alias}: newSearch {{ teachers(query: $q{i}, first: $count) "
+            f"{{ edges {{ node {{ ...TeacherFields }} }} }} }}"
+            for i, alias in enumerate(aliases)
+        )
+        query = f"query BatchTeacherSearch($count: Int!, {params}) {{\n{fields}\n}}\n{TEACHER_FIELDS}"
+        variables = {"count": 10}
+        for i, (first_name, last_name) in enumerate(batch):
+            variables[f"q{i}"] = {"text": f"{first_name} {last_name}", "schoolID": SCHOOL_ID, "fallback": True}
+
+        try:
+            data = post_graphql("BatchTeacherSearch", query, variables, timeout=timeout)
+        except RMPError as e:
+            return {}, {name: str(e) for name in batch}
+
+        payload = data.get("data") or {}
+        alias_errors = _alias_errors(data)
+        results, errors = {}, {}
+        for alias, name in zip(aliases, batch):
+            if alias in alias_errors or payload.get(alias) is None:
+                errors[name] = alias_errors.get(alias, "No data returned")
+                continue
+            edges = (payload[alias].get("teachers") or {}).get("edges", [])
+            results[name] = _match_teacher(edges, *name)
+        return results, errors
+
+    return _run_batches(fetch_batch, list(names), batch_size, max_workers)
+
+def fetch_professor_comments_batch(professor_ids, count=50, batch_size=BATCH_SIZE,
+                                   max_workers=MAX_CONCURRENCY, timeout=REQUEST_TIMEOUT):
+    """
+    Fetch ratings for many teacher ids with one aliased request per batch.
+
+    Returns:
+        (results, errors) keyed by teacher id, as in fetch_professor_info_batch
+    """
+    def fetch_batch(batch):
+        aliases = [f"n{i}" for i in range(len(batch))]
+        params = ", ".join(f"$id{i}: ID!" for i in range(len(batch)))
+        fields = "\n".join(
+            f"{alias}: node(id: $id{i}) {{ __typename ... on Teacher {{ ratings(first: $count) "
+            f"{{ edges {{ node {{ comment ratingTags class date }} }} }} }} }}"
+            for i, alias in enumerate(aliases)
+        )
+        query = f"query BatchRatingsList($count: Int!, {params}) {{\n{fields}\n}}"
+        variables = {"count": count}
+        for i, professor_id in enumerate(batch):
+            variables[f"id{i}"] = professor_id
+
+        try:
+            data = post_graphql("BatchRatingsList", query, variables, timeout=timeout)
+        except RMPError as e:
+            return {}, {professor_id: str(e) for professor_id in batch}
+
+        payload = data.get("data") or {}
+        alias_errors = _alias_errors(data)
+        results, errors = {}, {}
+        for alias, professor_id in zip(aliases, batch):
+            if alias in alias_errors or payload.get(alias) is None:
+                errors[professor_id] = alias_errors.get(alias, "No data returned")
+                continue
+            edges = (payload[alias].get("ratings") or {}).get("edges", [])
+            results[professor_id] = _parse_comment_edges(edges)
+        return results, errors
+
+    return _run_batches(fetch_batch, list(professor_ids), batch_size, max_workers)
+
 def save_combined_json(professor, comments, filename):
     combined = {
         "professor_info": {
@@ -175,16 +449,121 @@ def handle_ai_output(ai_json_text: str):
         rateMyProfessor(f"{first} {last}")
         
 
-def professorRater(first_name, last_name):
-    professor = get_professor_info(first_name, last_name)
+def professorRater(first_name, last_name, timeout=REQUEST_TIMEOUT):
+    # Served from the persistent RMP cache; misses and expired entries hit the API
+    cache = rmp_cache.get_cache()
+    try:
+        professor = cache.get_professor(
+            first_name, last_name, lambda: fetch_professor_info(first_name, last_name, timeout=timeout))
+    except RMPError as e:
+        print(f"Unable to fetch info for {first_name} {last_name}: {e}")
+        return None
     if not professor:
-        print(f"Professor not found or unable to fetch info for {first_name} {last_name}.")
+        print(f"Professor not found for {first_name} {last_name}.")
         return None
 
-    comments = get_professor_comments(professor.get("id"))
+    professor_id = professor.get("id")
+    try:
+        comments = cache.get_comments(professor_id, lambda: fetch_professor_comments(professor_id, timeout=timeout))
+    except RMPError as e:
+        print(f"Error fetching comments: {e}")
+        comments = []
 
     filename_base = f"{first_name}_{last_name}"
     combined_data = save_combined_json(professor, comments, f"{filename_base}.json")
     
     # Return the combined data structure that includes both professor info and comments
     return combined_data
+
+
+def rate_professors(names, max_workers=MAX_CONCURRENCY, timeout=REQUEST_TIMEOUT, batch_size=BATCH_SIZE):
+    """
+    Look up many professors at once, once per distinct professor.
+
+    Names are deduplicated (case/accent-insensitively) and served from the
+    RMP cache where possible. The rest are resolved with batched GraphQL
+    requests: one aliased search for all names and one aliased ratings
+    query for all teacher ids (split into batches of `batch_size`, run on
+    a bounded thread pool).
+
+    Args:
+        names: Iterable of (first_name, last_name) tuples
+        max_workers: Maximum number of batch requests in flight
+        timeout: Timeout for each HTTP call
+        batch_size: Names or teacher ids per GraphQL request
+
+    Returns:
+        Dict mapping each input tuple to professorRater-style combined data
+        (or None if the professor was not found or the lookup failed)
+    """
+    names = list(names)
+    unique = {}
+    for first_name, last_name in names:
+        unique.setdefault(rmp_cache.normalize_name(first_name, last_name), (first_name, last_name))
+    if not unique:
+        return {}
+
+    cache = rmp_cache.get_cache()
+
+    # Professor search: cache first, then one batched search for the misses
+    professors = {}
+    missing = []
+    for key, (first_name, last_name) in unique.items():
+        hit, professor = cache.peek_professor(
+            first_name, last_name,
+            lambda f=first_name, l=last_name: fetch_professor_info(f, l, timeout=timeout))
+        if hit:
+            professors[key] = professor
+        else:
+            cache.record_miss()
+            missing.append(key)
+    found, failed = fetch_professor_info_batch(
+        [unique[key] for key in missing], batch_size=batch_size, max_workers=max_workers, timeout=timeout)
+    for key in missing:
+        name = unique[key]
+        if name in failed:
+            print(f"⚠️ RateMyProfessor lookup failed for {' '.join(name)}: {failed[name]}")
+            professors[key] = None
+            continue
+        professors[key] = found.get(name)
+        cache.store_professor(*name, professors[key])
+
+    # Ratings: cache first, then one batched query for the misses
+    professor_ids = {p.get("id") for p in professors.values() if p and p.get("id")}
+    comments = {}
+    missing_ids = []
+    for professor_id in professor_ids:
+        hit, professor_comments = cache.peek_comments(
+            professor_id, lambda i=professor_id: fetch_professor_comments(i, timeout=timeout))
+        if hit:
+            comments[professor_id] = professor_comments
+        else:
+            cache.record_miss()
+            missing_ids.append(professor_id)
+    found, failed = fetch_professor_comments_batch(
+        missing_ids, batch_size=batch_size, max_workers=max_workers, timeout=timeout)
+    for professor_id in missing_ids:
+        if professor_id in failed:
+            print(f"⚠️ Could not fetch comments for {professor_id}: {failed[professor_id]}")
+            continue
+        comments[professor_id] = found.get(professor_id, [])
+        cache.store_comments(professor_id, comments[professor_id])
+
+    # Compact per-professor digest, cached until the info or comments it
+    # summarizes change (e.g. after a background refresh)
+    results = {}
+    for key, professor in professors.items():
+        if not professor:
+            results[key] = None
+            continue
+        professor_id = professor.get("id")
+        combined = save_combined_json(professor, comments.get(professor_id, []), None)
+        combined["digest"] = cache.get_digest(
+            professor_id, professor_digest.source_hash(combined),
+            lambda c=combined: professor_digest.build_digest(c))
+        results[key] = combined
+
+    return {
+        (first_name, last_name): results.get(rmp_cache.normalize_name(first_name, last_name))
+        for first_name, last_name in names
+    }
@@ -0,0 +1,284 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.getenv("RMP_CACHE_PATH", os.path.join(BACKEND_DIR, 'rmp_cache.sqlite3'))
+
+# Seconds before an entry is refreshed; stale entries are still served
+# (while a background refresh runs) until STALE_TTL has passed.
+RATINGS_TTL = float(os.getenv("RMP_RATINGS_TTL", str(24 * 3600)))
+COMMENTS_TTL = float(os.getenv("RMP_COMMENTS_TTL", str(7 * 24 * 3600)))
+NOT_FOUND_TTL = float(os.getenv("RMP_NOT_FOUND_TTL", str(24 * 3600)))
+STALE_TTL = float(os.getenv("RMP_STALE_TTL", str(30 * 24 * 3600)))
+MEMORY_CACHE_SIZE = int(os.getenv("RMP_MEMORY_CACHE_SIZE", "512"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS professors (
+    name_key TEXT PRIMARY KEY,
+    rmp_id TEXT,
+    info TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS comments (
+    rmp_id TEXT PRIMARY KEY,
+    comments TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS digests (
+    rmp_id TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+def normalize_name(first_name, last_name):
+    """Case-, accent- and whitespace-insensitive key for a professor name."""
+    text = unicodedata.normalize('NFKD', f"{first_name} {last_name}")
+    text = text.encode('ascii', 'ignore').decode()
+    return re.sub(r"\s+", ' ', text).strip().lower()
+
+class RMPCache:
+    """
+    Two-level cache for RateMyProfessors lookups.
+
+    An in-memory LRU sits on top of a SQLite file that survives restarts.
+    Professor search results are keyed by normalized name ("not found" is
+    cached too, with its own TTL); comment lists and their digests by RMP
+    teacher id. A digest is stored with a hash of the data it summarizes
+    and rebuilt when that changes, so refreshed comments never leave an
+    old digest behind.
+    Expired entries younger than `stale_ttl` are returned immediately
+    while a background thread refreshes them.
+    """
+
+    def __init__(self, path=CACHE_PATH, ratings_ttl=RATINGS_TTL, comments_ttl=COMMENTS_TTL,
+                 not_found_ttl=NOT_FOUND_TTL, stale_ttl=STALE_TTL, memory_size=MEMORY_CACHE_SIZE):
+        self.path = path
+        self.ratings_ttl = ratings_ttl
+        self.comments_ttl = comments_ttl
+        self.not_found_ttl = not_found_ttl
+        self.stale_ttl = stale_ttl
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='rmp-refresh')
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stale_served': 0, 'refreshes': 0}
+
+    def _db(self):
+        # sqlite3 connections can't be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def _memory_put(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, key):
+        kind, ident = key
+        if kind == 'professor':
+            row = self._db().execute(
+                "SELECT info, fetched_at FROM professors WHERE name_key = ?", (ident,)).fetchone()
+        elif kind == 'digest':
+            row = self._db().execute(
+                "SELECT digest, fetched_at FROM digests WHERE rmp_id = ?", (ident,)).fetchone()
+        else:
+            row = self._db().execute(
+                "SELECT comments, fetched_at FROM comments WHERE rmp_id = ?", (ident,)).fetchone()
+        if row is None:
+            return None
+        value = json.loads(row[0]) if row[0] is not None else None
+        return value, row[1]
+
+    def _disk_put(self, key, value, fetched_at):
+        kind, ident = key
+        conn = self._db()
+        with conn:
+            if kind == 'professor':
+                conn.execute(
+                    "INSERT OR REPLACE INTO professors (name_key, rmp_id, info, fetched_at) VALUES (?, ?, ?, ?)",
+                    (ident, value.get('id') if value else None,
+                     json.dumps(value) if value is not None else None, fetched_at))
+            elif kind == 'digest':
+                conn.execute(
+                    "INSERT OR REPLACE INTO digests (rmp_id, digest, fetched_at) VALUES (?, ?, ?)",
+                    (ident, json.dumps(value), fetched_at))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO comments (rmp_id, comments, fetched_at) VALUES (?, ?, ?)",
+                    (ident, json.dumps(value), fetched_at))
+
+    def _ttl(self, key, value):
+        if key[0] == 'digest':
+            # Checked against its source hash instead (see get_digest)
+            return float('inf')
+        if key[0] == 'comments':
+            return self.comments_ttl
+        return self.ratings_ttl if value is not None else self.not_found_ttl
+
+    def _store(self, key, value):
+        fetched_at = time.time()
+        self._memory_put(key, (value, fetched_at))
+        try:
+            self._disk_put(key, value, fetched_at)
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not write RateMyProfessor cache: {e}")
+
+    def _refresh(self, key, loader):
+        try:
+            self._store(key, loader())
+            self.stats['refreshes'] += 1
+        except Exception as e:
+            print(f"⚠️ Background RateMyProfessor refresh failed for {key[1]}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._refresher.submit(self._refresh, key, loader)
+
+    def _peek(self, key, refresh_loader=None):
+        """
+        Cached value for key without loading on a miss.
+
+        Returns:
+            (hit, value). Stale entries count as hits and, if refresh_loader
+            is given, are refreshed in the background.
+        """
+        entry = self._memory_get(key)
+        if entry is not None:
+            self.stats['memory_hits'] += 1
+        else:
+            try:
+                entry = self._disk_get(key)
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not read RateMyProfessor cache: {e}")
+                entry = None
+            if entry is not None:
+                self.stats['disk_hits'] += 1
+                self._memory_put(key, entry)
+
+        if entry is None:
+            return False, None
+        value, fetched_at = entry
+        age = time.time() - fetched_at
+        if age < self._ttl(key, value):
+            return True, value
+        if age < self.stale_ttl:
+            self.stats['stale_served'] += 1
+            if refresh_loader is not None:
+                self._schedule_refresh(key, refresh_loader)
+            return True, value
+        return False, value
+
+    def _get(self, key, loader):
+        hit, value = self._peek(key, loader)
+        if hit:
+            return value
+
+        self.stats['misses'] += 1
+        expired = value
+        try:
+            value = loader()
+        except Exception:
+            if expired is not None:
+                # Too old to serve normally, but better than failing
+                return expired
+            raise
+        self._store(key, value)
+        return value
+
+    def get_professor(self, first_name, last_name, loader):
+        """
+        Cached professor search result.
+
+        Args:
+            first_name, last_name: Professor name
+            loader: Callable returning the professor node or None if not found;
+                should raise on transport errors so they are not cached
+
+        Returns:
+            Professor node dict, or None if RateMyProfessors has no match
+        """
+        return self._get(('professor', normalize_name(first_name, last_name)), loader)
+
+    def get_comments(self, rmp_id, loader):
+        """Cached comment list for an RMP teacher id (see get_professor)."""
+        return self._get(('comments', rmp_id), loader)
+
+    def peek_professor(self, first_name, last_name, refresh_loader=None):
+        """(hit, professor node or None) without calling RateMyProfessors on a miss."""
+        return self._peek(('professor', normalize_name(first_name, last_name)), refresh_loader)
+
+    def store_professor(self, first_name, last_name, value):
+        self._store(('professor', normalize_name(first_name, last_name)), value)
+
+    def peek_comments(self, rmp_id, refresh_loader=None):
+        """(hit, comment list) without calling RateMyProfessors on a miss."""
+        return self._peek(('comments', rmp_id), refresh_loader)
+
+    def store_comments(self, rmp_id, value):
+        self._store(('comments', rmp_id), value)
+
+    def get_digest(self, rmp_id, source, loader):
+        """
+        Cached professor_digest digest for an RMP teacher id.
+
+        Args:
+            rmp_id: RMP teacher id
+            source: professor_digest.source_hash of the data to summarize
+            loader: Callable building the digest; called when nothing is
+                cached for rmp_id or the cached digest has another source
+        """
+        hit, entry = self._peek(('digest', rmp_id))
+        if hit and isinstance(entry, dict) and entry.get('source') == source:
+            return entry['digest']
+        self.stats['misses'] += 1
+        digest = loader()
+        self._store(('digest', rmp_id), {'source': source, 'digest': digest})
+        return digest
+
+    def record_miss(self):
+        self.stats['misses'] += 1
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Process-wide RMPCache, created on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RMPCache()
+        return _cache
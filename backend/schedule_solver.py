@@ -0,0 +1,183 @@
+from datetime import datetime, time, timedelta
+
+from timeslots import DAY_INDEX, meetings_mask
+
+# Stop enumerating once this many conflict-free schedules have been found
+MAX_CANDIDATES = 5000
+
+SKIPPED_STATUSES = ('CANCELLED', 'CANCELED')
+
+class NoValidScheduleError(ValueError):
+    """Every combination of sections has a time conflict."""
+
+def default_section_score(section, ratings):
+    """
+    Score a section by its professor's RateMyProfessor rating.
+
+    Unrated professors get a neutral 3.0; closed/waitlisted sections are
+    pushed down so open ones are preferred.
+    """
+    rating = ratings.get(section.teacher)
+    score = float(rating) if rating else 3.0
+    if section.status and section.status.upper() != 'OPEN':
+        score -= 1.0
+    return score
+
+def group_by_course(sections):
+    """Sections grouped by class number, in class number order."""
+    courses = {}
+    for section in sections:
+        if section.status.upper() in SKIPPED_STATUSES:
+            continue
+        courses.setdefault(section.class_number, []).append(section)
+    return [courses[k] for k in sorted(courses, key=lambda n: (len(n), n))]
+
+def enumerate_schedules(courses, scores, max_candidates=MAX_CANDIDATES):
+    """
+    Backtracking search for one-section-per-course combinations.
+
+    Each section's weekly bitmask is precomputed, so checking a partial
+    schedule for conflicts is a single AND against the running mask.
+    Courses with the fewest sections are placed first to prune early, and
+    within a course the best-scored sections are tried first.
+
+    Args:
+        courses: List of section lists, one list per course
+        scores: Dict of id(section) -> score
+        max_candidates: Upper bound on schedules returned
+
+    Returns:
+        List of (score, tuple of sections) tuples
+    """
+    options = []
+    for course_sections in sorted(courses, key=len):
+        ranked = sorted(course_sections, key=lambda s: -scores[id(s)])
+        options.append([(s, meetings_mask(s.meetings), scores[id(s)]) for s in ranked])
+
+    results = []
+    chosen = []
+
+    def search(depth, busy, total):
+        if len(results) >= max_candidates:
+            return
+        if depth == len(options):
+            results.append((total, tuple(chosen)))
+            return
+        for section, mask, score in options[depth]:
+            if busy & mask:
+                continue
+            chosen.append(section)
+            search(depth + 1, busy | mask, total + score)
+            chosen.pop()
+
+    search(0, 0, 0.0)
+    return results
+
+def pick_diverse(candidates, num_schedules):
+    """
+    Pick up to num_schedules high-scoring candidates that differ from each other.
+
+    Candidates are taken best-first; a candidate is accepted only if it
+    differs from every accepted schedule in at least `required` sections.
+    `required` starts at the number of courses and is relaxed until enough
+    schedules are found.
+    """
+    ranked = sorted(candidates, key=lambda c: -c[0])
+    if not ranked:
+        return []
+    size = len(ranked[0][1])
+    selected = []
+    for required in range(size, -1, -1):
+        for candidate in ranked:
+            if len(selected) >= num_schedules:
+                return selected
+            if any(candidate is s for s in selected):
+                continue
+            sections = set(map(id, candidate[1]))
+            if all(len(sections - set(map(id, s[1]))) >= required for s in selected):
+                selected.append(candidate)
+    return selected
+
+def solve_schedules(sections, num_schedules=3, ratings=None, score_section=default_section_score,
+                    max_candidates=MAX_CANDIDATES):
+    """
+    Find conflict-free schedules with one section per course.
+
+    Args:
+        sections: List of meeting_patterns.SectionRecord
+        num_schedules: Number of schedules to return
+        ratings: Dict of teacher name -> average rating, used for ranking
+        score_section: Callable(section, ratings) -> float
+        max_candidates: Upper bound on combinations enumerated
+
+    Returns:
+        List of tuples of SectionRecord, best first
+
+    Raises:
+        NoValidScheduleError: if no combination is conflict-free
+    """
+    ratings = ratings or {}
+    courses = group_by_course(sections)
+    if not courses:
+        raise NoValidScheduleError("No course sections to schedule")
+    scores = {id(s): score_section(s, ratings) for c in courses for s in c}
+    candidates = enumerate_schedules(courses, scores, max_candidates)
+    if not candidates:
+        names = ', '.join(c[0].course for c in courses)
+        raise NoValidScheduleError(f"No conflict-free combination of sections exists for: {names}")
+
+    order = {c[0].class_number: i for i, c in enumerate(courses)}
+    return [
+        tuple(sorted(combo, key=lambda s: order[s.class_number]))
+        for _, combo in pick_diverse(candidates, num_schedules)
+    ]
+
+def first_meeting_date(start_date, days):
+    """First date on or after start_date that falls on one of `days`."""
+    weekdays = {DAY_INDEX[d] for d in days if d in DAY_INDEX}
+    if not weekdays:
+        return start_date
+    for offset in range(7):
+        day = start_date + timedelta(days=offset)
+        if day.weekday() in weekdays:
+            return day
+    return start_date
+
+def schedule_entries(combo):
+    """
+    Calendar entries for a schedule, one per meeting pattern.
+
+    Entries use the summary/location/description/start/end/days_of_week/
+    end_sem shape that gcal and the frontend expect. TBA sections get an
+    entry without start/end times.
+    """
+    entries = []
+    for section in combo:
+        end_sem = section.end_date.isoformat() if section.end_date else ''
+        if not section.meetings:
+            entries.append({
+                'summary': section.course_section,
+                'location': section.location or 'TBA',
+                'description': section.teacher,
+                'start': None,
+                'end': None,
+                'days_of_week': [],
+                'end_sem': end_sem,
+            })
+            continue
+        for meeting in section.meetings:
+            start = end = None
+            if section.start_date:
+                day = first_meeting_date(section.start_date, meeting.days)
+                start = datetime.combine(day, time(*divmod(meeting.start, 60))).isoformat()
+                end = datetime.combine(day, time(*divmod(meeting.end, 60))).isoformat()
+            entries.append({
+                'summary': section.course_section,
+                'location': meeting.location or section.location,
+                'description': section.teacher,
+                'start': start,
+                'end': end,
+                'days_of_week': list(meeting.days),
+                'end_sem': end_sem,
+            })
+    return entries
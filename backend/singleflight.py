@@ -0,0 +1,250 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from course_index import parse_course_key
+
+# Seconds a finished result is served to identical requests
+RESULT_TTL = float(os.getenv("SCHEDULE_RESULT_TTL", "30"))
+MAX_RESULTS = int(os.getenv("SCHEDULE_RESULT_CACHE_SIZE", "256"))
+# Seconds a caller waits for an identical request in flight before
+# computing on its own (longer than a schedule job may run)
+WAIT_TIMEOUT = float(os.getenv("SCHEDULE_COALESCE_WAIT_TIMEOUT", "180"))
+# Seconds between wait events while a stream() caller waits (see stream)
+WAIT_POLL = float(os.getenv("SCHEDULE_COALESCE_WAIT_POLL", "1"))
+
+def normalize_courses(specific_courses):
+    """Sorted, de-duplicated canonical course keys ("MATH 51", "PHYS 32-2")."""
+    keys = set()
+    for text in (specific_courses or '').split(','):
+        text = text.strip()
+        if not text:
+            continue
+        parsed = parse_course_key(text)
+        if parsed:
+            subject, number, section = parsed
+            keys.add(f"{subject} {number}" + (f"-{section}" if section else ''))
+        else:
+            keys.add(' '.join(text.upper().split()))
+    return tuple(sorted(keys))
+
+def request_key(specific_courses, teacher_preference, num_schedules, quarter=None, **options):
+    """
+    Key under which identical schedule requests are coalesced.
+
+    Course order, case and spacing do not matter; neither does the case or
+    spacing of the teacher preference. Extra generate_schedules options
+    (e.g. llm_fallback) are part of the key.
+    """
+    return (
+        normalize_courses(specific_courses),
+        ' '.join((teacher_preference or '').lower().split()),
+        int(num_schedules),
+        (quarter or '').lower(),
+        tuple(sorted(options.items())),
+    )
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.completed = False
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent computations and briefly cache results.
+
+    The first caller for a key computes; callers arriving while it runs
+    wait for its result (or its exception) instead of starting their own.
+    Successful results are then served for `ttl` seconds. Every caller
+    gets its own deep copy, so results can be modified freely. A key of
+    None opts out: the computation just runs. Callers stop waiting after
+    `wait_timeout` seconds and compute on their own.
+    """
+
+    def __init__(self, ttl=RESULT_TTL, max_results=MAX_RESULTS, wait_timeout=WAIT_TIMEOUT, wait_poll=WAIT_POLL):
+        self.ttl = ttl
+        self.max_results = max_results
+        self.wait_timeout = wait_timeout
+        self.wait_poll = wait_poll
+        self._calls = {}
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'computed': 0, 'coalesced': 0, 'cache_hits': 0, 'wait_timeouts': 0}
+
+    def _join(self, key):
+        """('cached', result), ('follow', call) or ('lead', call) for key."""
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if time.time() - stored_at < self.ttl:
+                    self._results.move_to_end(key)
+                    self.stats['cache_hits'] += 1
+                    return 'cached', result
+                del self._results[key]
+            call = self._calls.get(key)
+            if call is not None:
+                self.stats['coalesced'] += 1
+                return 'follow', call
+            call = self._calls[key] = _Call()
+            self.stats['computed'] += 1
+            return 'lead', call
+
+    def _finish(self, key, call, result=None, error=None, completed=True):
+        with self._lock:
+            call.result = result
+            call.error = error
+            call.completed = completed
+            if completed and error is None and self.ttl > 0:
+                self._results[key] = (time.time(), result)
+                while len(self._results) > self.max_results:
+                    self._results.popitem(last=False)
+            self._calls.pop(key, None)
+        call.done.set()
+
+    def _wait(self, call):
+        """
+        Wait for the leader of call.
+
+        Returns:
+            True if it finished, False if it gave up, None if it is still
+            running after wait_timeout seconds
+
+        Raises:
+            The leader's exception
+        """
+        if not call.done.wait(self.wait_timeout):
+            self._wait_timed_out()
+            return None
+        return self._outcome(call)
+
+    def _wait_events(self, call, wait_event=None):
+        """
+        _wait for stream(), yielding a copy of wait_event every wait_poll
+        seconds while the leader runs.
+
+        The events give the consumer a chance to check its own deadline or
+        cancellation and close the stream, which ends the wait.
+
+        Returns:
+            Like _wait
+        """
+        if wait_event is None:
+            return self._wait(call)
+        deadline = time.monotonic() + self.wait_timeout
+        while not call.done.wait(max(0.0, min(self.wait_poll, deadline - time.monotonic()))):
+            if time.monotonic() >= deadline:
+                self._wait_timed_out()
+                return None
+            yield copy.deepcopy(wait_event)
+        return self._outcome(call)
+
+    def _wait_timed_out(self):
+        with self._lock:
+            self.stats['wait_timeouts'] += 1
+        print(f"⚠️ Identical request still running after {self.wait_timeout:g}s, computing separately")
+
+    @staticmethod
+    def _outcome(call):
+        if call.error is not None:
+            raise call.error
+        return call.completed
+
+    def do(self, key, fn):
+        """
+        fn() for the first caller with this key; everyone else shares its outcome.
+
+        Returns:
+            A copy of fn()'s result
+        """
+        if key is None:
+            return fn()
+        while True:
+            role, value = self._join(key)
+            if role == 'cached':
+                return copy.deepcopy(value)
+            if role == 'follow':
+                outcome = self._wait(value)
+                if outcome is None:
+                    return fn()
+                if outcome:
+                    return copy.deepcopy(value.result)
+                continue  # leader gave up (streamed caller went away); try again
+            try:
+                result = fn()
+            except BaseException as e:
+                self._finish(key, value, error=e)
+                raise
+            self._finish(key, value, result)
+            return copy.deepcopy(result)
+
+    def stream(self, key, events_fn, collect, replay, wait_event=None):
+        """
+        Streaming form of do() for event generators.
+
+        The leader's events are passed through live; callers that joined a
+        computation in flight, or hit the cache, get replay(result) once
+        it is available. Every caller gets its own copy of each event.
+
+        Args:
+            key: Coalescing key
+            events_fn: Callable returning the event iterator
+            collect: Builds the shareable result from the list of events
+            replay: Turns a result back into events
+            wait_event: Yielded every wait_poll seconds while waiting for
+                the leader, so consumers that check deadlines or
+                cancellation between events can stop waiting
+
+        Yields:
+            Events
+        """
+        if key is None:
+            yield from events_fn()
+            return
+        while True:
+            role, value = self._join(key)
+            if role == 'cached':
+                yield from replay(copy.deepcopy(value))
+                return
+            if role == 'follow':
+                outcome = yield from self._wait_events(value, wait_event)
+                if outcome is None:
+                    yield from events_fn()
+                    return
+                if outcome:
+                    yield from replay(copy.deepcopy(value.result))
+                    return
+                continue
+            break
+
+        call = value
+        events = []
+        source = events_fn()
+        finished = False
+        try:
+            for event in source:
+                events.append(event)
+                # The caller may modify what it gets (e.g. pop the event name)
+                yield copy.deepcopy(event)
+            result = collect(events)
+            self._finish(key, call, result)
+            finished = True
+        except GeneratorExit:
+            # Cancelled or timed out: let a waiting caller compute instead
+            if hasattr(source, 'close'):
+                source.close()
+            self._finish(key, call, completed=False)
+            finished = True
+            raise
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            finished = True
+            raise
+        finally:
+            # Never leave followers waiting on a flight that can't finish
+            if not finished:
+                self._finish(key, call, completed=False)
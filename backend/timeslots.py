@@ -0,0 +1,83 @@
+from datetime import datetime
+from functools import lru_cache
+
+from meeting_patterns import DAY_CODES
+
+MINUTES_PER_DAY = 24 * 60
+DAY_INDEX = {code: i for i, code in enumerate(DAY_CODES)}
+
+def weekly_mask(days, start, end):
+    """
+    Encode a weekly time range as a bitset over the week's minutes.
+
+    Bit (day * 1440 + minute) is set for every minute the class meets, so
+    two ranges overlap exactly when their masks share a bit.
+
+    Args:
+        days: Iterable of day codes ("MO", "TU", ...)
+        start, end: Minutes after midnight, end exclusive
+
+    Returns:
+        int bitmask (0 for an empty or invalid range)
+    """
+    if end <= start:
+        return 0
+    span = ((1 << (end - start)) - 1) << start
+    mask = 0
+    for day in days:
+        index = DAY_INDEX.get(day)
+        if index is not None:
+            mask |= span << (index * MINUTES_PER_DAY)
+    return mask
+
+def meetings_mask(meetings):
+    """Combined weekly mask for a sequence of meeting_patterns.Meeting."""
+    mask = 0
+    for meeting in meetings:
+        mask |= weekly_mask(meeting.days, meeting.start, meeting.end)
+    return mask
+
+def _minute_of_day(value):
+    # Fast path for "YYYY-MM-DDTHH:MM[:SS]"; anything else goes through fromisoformat
+    if len(value) >= 16 and value[10] == 'T' and value[13] == ':':
+        return int(value[11:13]) * 60 + int(value[14:16])
+    dt = datetime.fromisoformat(value)
+    return dt.hour * 60 + dt.minute
+
+@lru_cache(maxsize=4096)
+def _entry_mask(start, end, days):
+    try:
+        return weekly_mask(days, _minute_of_day(start), _minute_of_day(end))
+    except (TypeError, ValueError):
+        return 0
+
+def entry_mask(entry):
+    """
+    Weekly mask for a schedule entry (start/end ISO datetimes + days_of_week).
+
+    Only the time of day of start/end matters; the class is assumed to meet
+    at that time on every listed day. Entries without days or times, or
+    with unparseable times, get an empty mask and never conflict.
+    """
+    days = entry.get('days_of_week') or ()
+    if isinstance(days, str):
+        days = [d.strip() for d in days.split(',')]
+    return _entry_mask(entry.get('start'), entry.get('end'), tuple(days))
+
+def entries_overlap(entry1, entry2):
+    return bool(entry_mask(entry1) & entry_mask(entry2))
+
+def schedule_is_valid(entries):
+    """
+    True if no two entries meet at the same time.
+
+    Each entry is encoded once and checked against the union of the
+    entries before it, so a whole schedule validates in one pass.
+    """
+    busy = 0
+    for entry in entries:
+        mask = entry_mask(entry)
+        if busy & mask:
+            return False
+        busy |= mask
+    return True